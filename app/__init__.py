@@ -1,4 +1,5 @@
 from flask import Flask
+from rpa.config_rpa import ensure_dirs
 from .config import Config
 
 
@@ -13,6 +14,9 @@ def create_app(config_class=Config):
     3. Centraliza o registro de Blueprints.
     """
 
+    # Diretórios de logs/downloads (criados uma vez na subida, não no import do RPA)
+    ensure_dirs()
+
     # Inicializa a aplicação Flask
     app = Flask(__name__)
 
@@ -15,7 +15,6 @@ from werkzeug.utils import secure_filename
 from app.config import Config
 from app.layout_config import REQUIRED_HEADER_FIELDS
 from app.converter import process_conversion
-from rpa.bot_controller import run_rpa_process
 from rpa.utils import setup_logger
 
 
@@ -240,6 +239,10 @@ def update_rpa_status(task_id, message, success=None, details=None):
 
 def rpa_worker(task_id, file_path, inscricao, is_dev, mes, ano):
     """Wrapper para rodar o RPA em thread separada."""
+    # Import tardio: o Playwright só é carregado quando a primeira tarefa RPA roda,
+    # não na subida do Flask (rotas de conversão nunca precisam dele).
+    from rpa.bot_controller import run_rpa_process
+
     logger.info(f"[{task_id}] Iniciando worker RPA para IM: {inscricao} (Comp: {mes}/{ano})")
     try:
         result = run_rpa_process(
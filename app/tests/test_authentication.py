@@ -0,0 +1,136 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from rpa.authentication import ISSAuthenticator
+from rpa.error_handler import AuthenticationError
+
+
+class _Node:
+    def __init__(self, kind, visible=True, text=""):
+        self.kind = kind
+        self.visible = visible
+        self.text = text
+
+
+class _FakeLocator:
+    """Locator mínimo sobre uma lista de nós em ordem de documento."""
+
+    def __init__(self, dom, match, only_first=False):
+        self.dom = dom
+        self.match = match
+        self.only_first = only_first
+
+    def _nodes(self):
+        nodes = [n for n in self.dom.nodes if self.match(n)]
+        return nodes[:1] if self.only_first else nodes
+
+    def or_(self, other):
+        return _FakeLocator(self.dom, lambda n: self.match(n) or other.match(n))
+
+    def filter(self, visible):
+        return _FakeLocator(self.dom, lambda n: self.match(n) and n.visible == visible)
+
+    @property
+    def first(self):
+        return _FakeLocator(self.dom, self.match, only_first=True)
+
+    async def wait_for(self, state, timeout):
+        # .first resolve para o primeiro nó do DOM, visível ou não
+        nodes = self._nodes()
+        if not (nodes and nodes[0].visible):
+            raise PlaywrightTimeoutError("timeout")
+
+    async def is_visible(self):
+        nodes = self._nodes()
+        return bool(nodes) and nodes[0].visible
+
+    async def inner_text(self):
+        return self._nodes()[0].text
+
+    async def click(self):
+        self.dom.clicked = True
+
+
+class _FakePage:
+    """Página cujo PostBack do login troca o DOM ao ser respondido."""
+
+    def __init__(self, nodes, after_postback):
+        self.nodes = nodes
+        self.after_postback = after_postback
+        self.clicked = False
+        self.listeners = []
+
+    def on(self, event, handler):
+        self.listeners.append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners.remove(handler)
+
+    def expect_response(self, predicate, timeout):
+        page = self
+        request = SimpleNamespace(method="POST", is_navigation_request=lambda: True)
+        response = SimpleNamespace(url="https://portal/login.aspx", request=request)
+
+        async def _value():
+            return response
+
+        class _Ctx:
+            async def __aenter__(self):
+                return SimpleNamespace(value=_value())
+
+            async def __aexit__(self, *exc):
+                assert page.clicked and predicate(response)
+                page.nodes = page.after_postback
+                for handler in list(page.listeners):
+                    handler(page)
+                return False
+
+        return _Ctx()
+
+
+def _authenticator(page):
+    locs = SimpleNamespace(
+        login=SimpleNamespace(
+            submit_button=_FakeLocator(page, lambda n: n.kind == "submit"),
+            error_message=_FakeLocator(page, lambda n: n.kind == "alert"),
+        ),
+        selecao_empresa=SimpleNamespace(
+            input_filtro_cnpj=_FakeLocator(page, lambda n: n.kind == "cnpj"),
+        ),
+    )
+    return ISSAuthenticator(page, "T1", locs=locs)
+
+
+def test_login_ignores_hidden_alert_before_success_input():
+    """Um .alert-danger oculto antes no DOM não prende a espera até o timeout."""
+    page = _FakePage(
+        nodes=[_Node("submit")],
+        after_postback=[_Node("alert", visible=False), _Node("cnpj")],
+    )
+
+    asyncio.run(_authenticator(page)._enviar_credenciais())
+
+    assert page.listeners == []
+
+
+def test_login_ignores_stale_alert_until_postback_settles():
+    """O alerta visível da tentativa anterior não é lido como recusa da atual."""
+    page = _FakePage(
+        nodes=[_Node("alert", text="Senha inválida"), _Node("submit")],
+        after_postback=[_Node("cnpj")],
+    )
+
+    asyncio.run(_authenticator(page)._enviar_credenciais())
+
+
+def test_login_reports_visible_alert_after_postback():
+    page = _FakePage(
+        nodes=[_Node("submit")],
+        after_postback=[_Node("alert", visible=False), _Node("alert", text=" Senha inválida ")],
+    )
+
+    with pytest.raises(AuthenticationError, match="Falha no login: Senha inválida$"):
+        asyncio.run(_authenticator(page)._enviar_credenciais())
@@ -0,0 +1,60 @@
+from rpa.config_rpa import _parse_companies_csv
+
+
+def test_inscricao_keeps_only_ascii_digits(tmp_path):
+    """
+    Formatting and typographic characters pasted from a spreadsheet are dropped;
+    full-width, superscript and other-script digits are kept as ASCII digits.
+    """
+    csv_path = tmp_path / "configuracoes.csv"
+    csv_path.write_text(
+        "inscricao_municipal;cnpj\n"
+        "12.345-6;00.000.000/0001-91\n"
+        "78–90;11.111.111/0001-11\n"  # En dash
+        "１２2;22.222.222/0001-22\n"  # Full-width "12"
+        "45²³¹;33.333.333/0001-33\n"  # Latin-1 superscripts
+        "٤٥;44.444.444/0001-44\n",  # Arabic-Indic "45"
+        encoding="utf-8",
+    )
+
+    rows = _parse_companies_csv(csv_path)
+
+    assert rows["123456"] == ("123456", "00.000.000/0001-91")
+    assert rows["7890"] == ("7890", "11.111.111/0001-11")
+    assert rows["122"] == ("122", "22.222.222/0001-22")
+    assert rows["45231"] == ("45231", "33.333.333/0001-33")
+    assert rows["45"] == ("45", "44.444.444/0001-44")
+    # The original formatted value is still accepted as a lookup key
+    assert rows["12.345-6"] is rows["123456"]
+    assert all(clean.isascii() and clean.isdigit() for clean, _ in rows.values())
+
+
+def test_parse_companies_csv_by_header_columns(tmp_path):
+    """
+    Columns are located by header name (any order, extra columns ignored);
+    blank and truncated rows are skipped, and a blank CNPJ cell becomes None.
+    """
+    csv_path = tmp_path / "configuracoes.csv"
+    csv_path.write_text(
+        "razao_social;cnpj;inscricao_municipal\n"
+        "Empresa A;00.000.000/0001-91;111\n"
+        "\n"
+        "Empresa B\n"
+        "Empresa C;;222\n"
+        "Empresa D;11.111.111/0001-11;\n",
+        encoding="utf-8",
+    )
+
+    rows = _parse_companies_csv(csv_path)
+
+    assert rows == {
+        "111": ("111", "00.000.000/0001-91"),
+        "222": ("222", None),
+    }
+
+
+def test_parse_companies_csv_missing_cnpj_column_value(tmp_path):
+    csv_path = tmp_path / "configuracoes.csv"
+    csv_path.write_text("inscricao_municipal;cnpj\n333\n", encoding="utf-8")
+
+    assert _parse_companies_csv(csv_path) == {"333": ("333", None)}
@@ -0,0 +1,64 @@
+import gzip
+import logging
+from logging.handlers import RotatingFileHandler
+
+import view_logs
+from rpa.utils import _gzip_namer, _gzip_rotator
+
+
+def test_rotated_backups_are_gzipped(tmp_path):
+    """
+    On rollover the full log is compressed into <name>.N.gz and the plain
+    copy is removed; older backups shift to the next number.
+    """
+    log_file = tmp_path / "execution_20250101.log"
+    handler = RotatingFileHandler(log_file, maxBytes=200, backupCount=3, delay=True)
+    handler.namer = _gzip_namer
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    logger = logging.getLogger("test_rotated_backups_are_gzipped")
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        for i in range(40):
+            logger.warning("line %02d xxxxxxxxxxxxxxxxxxxxxxxx", i)
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    names = sorted(p.name for p in tmp_path.iterdir())
+    assert names == [
+        "execution_20250101.log",
+        "execution_20250101.log.1.gz",
+        "execution_20250101.log.2.gz",
+        "execution_20250101.log.3.gz",
+    ]
+    newest_backup = gzip.decompress((tmp_path / "execution_20250101.log.1.gz").read_bytes())
+    older_backup = gzip.decompress((tmp_path / "execution_20250101.log.2.gz").read_bytes())
+    assert newest_backup.startswith(b"line ")
+    # Backups hold consecutive, complete lines; the newest one continues the older one
+    last_old = int(older_backup.splitlines()[-1].split()[1])
+    first_new = int(newest_backup.splitlines()[0].split()[1])
+    assert first_new == last_old + 1
+
+
+def test_view_logs_tails_gzip_backup(tmp_path, monkeypatch, capsysbinary):
+    """
+    A gzipped backup is tailed in one pass: only the last TAIL_BYTES are shown,
+    starting at a complete line, and --full prints everything.
+    """
+    lines = b"".join(b"line %06d\n" % i for i in range(20000))
+    (tmp_path / "execution_20250101.log.1.gz").write_bytes(gzip.compress(lines))
+    monkeypatch.setattr(view_logs, "LOGS_DIR", tmp_path)
+    monkeypatch.setattr(view_logs, "TAIL_BYTES", 1024)
+
+    view_logs.view_latest_log()
+    out = capsysbinary.readouterr().out
+    tail = out.split(b"whole file]\n\n", 1)[1]
+    assert len(tail) <= 1024
+    assert tail.startswith(b"line ")
+    assert lines.endswith(tail)
+
+    view_logs.view_latest_log(full=True)
+    assert capsysbinary.readouterr().out.endswith(lines)
@@ -0,0 +1,26 @@
+import pytest
+
+from rpa.result_parser import classificar_linha
+
+
+@pytest.mark.parametrize(
+    "linha, esperado",
+    [
+        ("01/2025 arquivo.txt Processado com Sucesso", "Processado com Sucesso"),
+        ("01/2025 arquivo.txt Importado com ÊXITO", "Processado com Sucesso"),
+        ("01/2025 arquivo.txt Processado com Erro", "Processado com Erro"),
+        ("01/2025 arquivo.txt Aguardando", "Aguardando"),
+        ("01/2025 arquivo.txt PROCESSANDO", "Aguardando"),
+        # More than one keyword: sucesso beats erro, erro beats aguardando
+        ("Processado com Sucesso (0 registros com erro)", "Processado com Sucesso"),
+        ("Aguardando reprocessamento após erro", "Processado com Erro"),
+    ],
+)
+def test_classificar_linha_status_priority(linha, esperado):
+    assert classificar_linha(linha) == esperado
+
+
+def test_classificar_linha_unknown_status():
+    assert classificar_linha("01/2025 arquivo.txt Cancelado") == (
+        "Status Desconhecido: 01/2025 arquivo.txt Cancelado"
+    )
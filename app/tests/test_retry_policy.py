@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from rpa.bot_controller import RETRY_POLICY, RetrySpec, _backoff, _retry_spec_for
+from rpa.error_handler import (
+    AuthenticationError,
+    CredentialError,
+    NavigationError,
+    PortalOfflineError,
+)
+
+
+def test_retry_spec_follows_exception_mro():
+    """Subclasses inherit their parent's policy; unknown errors are never retried."""
+    assert _retry_spec_for(PortalOfflineError("down")) is RETRY_POLICY[PortalOfflineError]
+    assert _retry_spec_for(AuthenticationError("bad")) is RETRY_POLICY[AuthenticationError]
+    # CredentialError is not in the table: resolved through AuthenticationError
+    assert _retry_spec_for(CredentialError("bad")) is RETRY_POLICY[AuthenticationError]
+
+    for error in (NavigationError("x"), ValueError("x")):
+        spec = _retry_spec_for(error)
+        assert not spec.recoverable
+        assert spec.max_retries == 0
+
+
+@pytest.mark.parametrize("attempt", [1, 2, 3, 4, 10])
+def test_backoff_full_jitter_bound(attempt):
+    """Waits are drawn from [0, min(max_delay, base_delay * 2^(attempt-1))]."""
+    spec = RetrySpec(5, 2.0, 10.0, 60.0)
+    ceiling = min(spec.max_delay, spec.base_delay * 2 ** (attempt - 1))
+
+    random.seed(attempt)
+    waits = [_backoff(spec, attempt) for _ in range(500)]
+
+    assert all(0 <= w <= ceiling for w in waits)
+    # Full jitter spreads the waits over the whole range instead of a fixed delay
+    assert max(waits) - min(waits) > ceiling / 2
@@ -0,0 +1,36 @@
+from pathlib import Path
+
+from rpa.utils import validate_file_exists, validate_file_with_size
+
+
+def test_validate_file_exists_accepts_str_and_path(tmp_path):
+    arquivo = tmp_path / "arquivo.txt"
+    arquivo.write_text("conteudo", encoding="utf-8")
+
+    assert validate_file_exists(str(arquivo)) == (True, "")
+    assert validate_file_exists(arquivo) == (True, "")
+    assert validate_file_with_size(arquivo) == (True, "", len("conteudo"))
+
+
+def test_validate_file_exists_rejects_missing_dir_and_empty(tmp_path):
+    vazio = tmp_path / "vazio.txt"
+    vazio.touch()
+
+    valid, error = validate_file_exists(tmp_path / "inexistente.txt")
+    assert not valid and error.startswith("Arquivo não encontrado")
+
+    valid, error = validate_file_exists(tmp_path)
+    assert not valid and error.startswith("Caminho não aponta para um arquivo válido")
+
+    valid, error = validate_file_exists(vazio)
+    assert not valid and error.startswith("Arquivo vazio")
+
+
+def test_validate_file_exists_sees_file_changes(tmp_path):
+    """Every call re-checks the file: filling an empty file makes it valid."""
+    arquivo = tmp_path / "arquivo.txt"
+    arquivo.touch()
+    assert validate_file_exists(arquivo)[0] is False
+
+    arquivo.write_text("agora tem conteudo", encoding="utf-8")
+    assert validate_file_exists(Path(arquivo)) == (True, "")
@@ -16,6 +16,7 @@ from rpa.config_rpa import (
     is_development_mode,
     is_production_mode,
     get_credentials_by_inscricao,
+    ensure_dirs,
 )
 
 from rpa.utils import setup_logger, generate_task_id, validate_file_exists
@@ -26,6 +27,7 @@ __all__ = [
     "is_development_mode",
     "is_production_mode",
     "get_credentials_by_inscricao",
+    "ensure_dirs",
     "setup_logger",
     "generate_task_id",
     "validate_file_exists",
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Caminhos do Projeto (rpa/_paths.py).
+
+Fonte única dos diretórios usados por config_rpa e utils: a raiz do projeto é
+resolvida (realpath) uma só vez, e a criação de diretórios fica em um helper explícito.
+"""
+from pathlib import Path
+from typing import Iterable
+
+# Estrutura: projeto-nfe/rpa/_paths.py -> RPA_DIR = projeto-nfe/rpa/
+RPA_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = RPA_DIR.parent
+
+# Estrutura de Logs (Apenas Textuais)
+LOGS_DIR = PROJECT_ROOT / "rpa_logs"
+EXECUTION_LOGS_DIR = LOGS_DIR / "execution_logs"
+DEBUG_SCREENSHOTS_DIR = LOGS_DIR / "debug_screenshots"
+# Sessões do navegador (cookies/localStorage) salvas por Inscrição Municipal
+SESSION_STATES_DIR = LOGS_DIR / "session_states"
+
+# Diretório de downloads/uploads (onde ficam os arquivos TXT gerados)
+DOWNLOADS_DIR = PROJECT_ROOT / "downloads"
+
+
+def _ensure_dirs(directories: Iterable[Path]) -> None:
+    """
+    Cria os diretórios informados (e os pais), ignorando os que já existem.
+
+    Em execuções "quentes" tudo já existe: um único stat (is_dir) por diretório
+    substitui as chamadas mkdir que falhariam com EEXIST.
+    """
+    for directory in directories:
+        if not directory.is_dir():
+            directory.mkdir(parents=True, exist_ok=True)
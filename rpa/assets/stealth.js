@@ -0,0 +1,6 @@
+// Injetado em cada documento antes dos scripts do portal (context.add_init_script).
+// Remove os sinais de automação mais consultados pelo desafio do Cloudflare.
+Object.defineProperty(navigator, "webdriver", { get: () => undefined });
+Object.defineProperty(navigator, "languages", { get: () => ["pt-BR", "pt", "en-US", "en"] });
+Object.defineProperty(navigator, "plugins", { get: () => [1, 2, 3, 4, 5] });
+window.chrome = window.chrome || { runtime: {} };
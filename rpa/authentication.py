@@ -7,25 +7,53 @@ Responsabilidade:
 2. Resolver o desafio do Teclado Virtual Dinâmico.
 3. Validar se o acesso foi concedido, reportando progresso detalhado.
 """
+import asyncio
 import time
-from datetime import datetime
+from types import SimpleNamespace
 from typing import Callable, Optional
-from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 
 
 # Módulos de configuração e utilitários
 from rpa.config_rpa import (
-    SELECTORS,
     ISSNET_URL,
     LOGIN_TIMEOUT,
+    NAV_WAIT,
     DEBUG_SCREENSHOTS_DIR,
+    SELECTORS,
+    VIRTUAL_KEYBOARD_BATCH,
 )
 from rpa.error_handler import AuthenticationError
+from rpa.locators import build_locators
+from rpa.portal_navigator import _is_postback
 from rpa.utils import setup_logger
 
 # Configuração do Logger para este módulo
 logger = setup_logger("rpa_authentication")
 
+# Botões numéricos do teclado virtual (o "limpar" nunca é clicado)
+_KEYBOARD_SELECTORS = [
+    selector
+    for key, selector in SELECTORS["login"]["virtual_keyboard"].items()
+    if key != "limpar"
+]
+
+# Clica, dentro da página, o botão visível cujo rótulo contém cada dígito.
+# Retorna o primeiro dígito sem botão correspondente, ou null se todos foram clicados.
+_TECLADO_VIRTUAL_JS = """
+([selectors, digits]) => {
+    const buttons = selectors
+        .map((sel) => document.querySelector(sel))
+        .filter((btn) => btn && btn.offsetParent !== null);
+    for (const digit of digits) {
+        const btn = buttons.find((b) => (b.value || b.textContent || "").includes(digit));
+        if (!btn) return digit;
+        btn.click();
+    }
+    return null;
+}
+"""
+
 
 class ISSAuthenticator:
     """
@@ -33,25 +61,34 @@ class ISSAuthenticator:
     incluindo a resolução do teclado virtual.
     """
 
-    def __init__(self, page: Page, task_id: str):
+    def __init__(self, page: Page, task_id: str, locs: Optional[SimpleNamespace] = None):
         """
         Inicializa o autenticador.
 
         Args:
             page (Page): Objeto Page do Playwright (sessão do navegador).
             task_id (str): ID da tarefa para rastreamento nos logs.
+            locs (SimpleNamespace, optional): Locators pré-construídos (rpa.locators).
         """
         self.page = page
         self.task_id = task_id
+        self.locs = locs or build_locators(page)
 
-    def _take_debug_screenshot(self):
-        """Salva uma screenshot da tela atual para depuração."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    async def _take_debug_screenshot(self):
+        """
+        Salva uma screenshot da tela atual para depuração.
+        A captura vem em memória e a gravação em disco roda em uma thread do executor,
+        sem bloquear o event loop compartilhado pelos demais robôs.
+        """
+        # Sufixo monotônico em ns: único mesmo com duas falhas no mesmo segundo
+        # (o horário legível fica na linha de log que registra o caminho)
         screenshot_path = (
-            DEBUG_SCREENSHOTS_DIR / f"login_failed_{self.task_id}_{timestamp}.png"
+            DEBUG_SCREENSHOTS_DIR / f"login_failed_{self.task_id}_{time.monotonic_ns()}.jpg"
         )
         try:
-            self.page.screenshot(path=screenshot_path)
+            # JPEG q60 da área visível: basta para inspeção e codifica bem mais rápido que PNG
+            image = await self.page.screenshot(type="jpeg", quality=60, full_page=False)
+            await asyncio.to_thread(screenshot_path.write_bytes, image)
             logger.info(
                 f"[{self.task_id}] Screenshot de depuração salva em: {screenshot_path}"
             )
@@ -60,7 +97,7 @@ class ISSAuthenticator:
                 f"[{self.task_id}] Falha ao salvar screenshot de depuração: {e}"
             )
 
-    def login(
+    async def login(
         self,
         user: str,
         password: str,
@@ -93,13 +130,13 @@ class ISSAuthenticator:
             )
             if status_callback:
                 status_callback("Navegando para o portal...")
-            self.page.goto(ISSNET_URL, timeout=LOGIN_TIMEOUT)
+            await self.page.goto(ISSNET_URL, wait_until=NAV_WAIT, timeout=LOGIN_TIMEOUT)
 
             # --- Detecção e Tratamento Robusto de Cloudflare ---
-            user_selector = SELECTORS["login"]["username_input"]
+            user_input = self.locs.login.username_input
             try:
                 # 1. Verifica preliminar de Cloudflare (Título ou Iframes)
-                page_title = self.page.title().lower()
+                page_title = (await self.page.title()).lower()
                 if "just a moment" in page_title or "challenge" in page_title:
                     logger.warning(f"[{self.task_id}] Cloudflare detectado no carregamento inicial.")
                     if status_callback:
@@ -114,12 +151,15 @@ class ISSAuthenticator:
                             if "cloudflare" in frame.url or "turnstile" in frame.url:
                                 logger.info(f"[{self.task_id}] Iframe de desafio encontrado: {frame.url}")
                                 # Tenta clicar no checkbox dentro do iframe
-                                checkbox = frame.locator("input[type='checkbox'], #challenge-stage")
-                                if checkbox.count() > 0:
-                                    logger.info(f"[{self.task_id}] Tentando clicar no checkbox do Cloudflare...")
-                                    checkbox.first.click(force=True)
-                                    time.sleep(2)
-                                    challenge_found = True
+                                # .first sem count(): o próprio timeout do clique sinaliza "não encontrado"
+                                checkbox = frame.locator("input[type='checkbox'], #challenge-stage").first
+                                logger.info(f"[{self.task_id}] Tentando clicar no checkbox do Cloudflare...")
+                                try:
+                                    await checkbox.click(force=True, timeout=3000)
+                                except PlaywrightTimeoutError:
+                                    continue
+                                await asyncio.sleep(2)
+                                challenge_found = True
 
                         if not challenge_found:
                             # Tenta clicar por coordenadas se não achar seletor (fallback)
@@ -130,9 +170,7 @@ class ISSAuthenticator:
                         logger.warning(f"[{self.task_id}] Erro ao tentar interagir com Cloudflare: {cf_e}")
 
                 # 2. Espera o seletor do login aparecer (Isso confirma que o Cloudflare passou)
-                self.page.wait_for_selector(
-                    user_selector, state="visible", timeout=LOGIN_TIMEOUT
-                )
+                await user_input.wait_for(state="visible", timeout=LOGIN_TIMEOUT)
                 logger.info(f"[{self.task_id}] Página de login carregada com sucesso.")
 
             except PlaywrightTimeoutError:
@@ -146,30 +184,18 @@ class ISSAuthenticator:
             logger.debug(f"[{self.task_id}] Preenchendo campo de usuário.")
             if status_callback:
                 status_callback("Inserindo usuário...")
-            self.page.fill(user_selector, user)
-            time.sleep(0.5)  # Pequena pausa para simular comportamento humano
+            await user_input.fill(user)
+            await asyncio.sleep(0.5)  # Pequena pausa para simular comportamento humano
 
             # 3. Resolução do Teclado Virtual (Senha)
             if status_callback:
                 status_callback("Resolvendo teclado virtual...")
-            self._resolver_teclado_virtual(password)
+            await self._resolver_teclado_virtual(password)
 
-            # 4. Submissão
-            logger.debug(f"[{self.task_id}] Clicando no botão de submissão.")
+            # 4. Submissão e 5. Validação do Sucesso
             if status_callback:
                 status_callback("Enviando credenciais...")
-            btn_submit = SELECTORS["login"]["submit_button"]
-            self.page.click(btn_submit)
-            time.sleep(1)  # Aguarda um momento para a página começar a reagir
-
-            # 5. Validação do Sucesso (Element-Based)
-            logger.debug(
-                f"[{self.task_id}] Validando sucesso do login pela presença do filtro de CNPJ..."
-            )
-            success_selector = SELECTORS["selecao_empresa"]["input_filtro_cnpj"]
-            self.page.wait_for_selector(
-                success_selector, state="visible", timeout=30000
-            )
+            await self._enviar_credenciais()
 
             logger.info(
                 f"[{self.task_id}] ✅ Login para o usuário '{user[:4]}...' validado com sucesso!"
@@ -177,14 +203,14 @@ class ISSAuthenticator:
             return True
 
         except PlaywrightTimeoutError:
-            self._take_debug_screenshot()
+            await self._take_debug_screenshot()
             # Após um timeout, a primeira suspeita é uma falha de login explícita.
-            error_selector = SELECTORS["login"]["error_message"]
-            error_locator = self.page.locator(error_selector)
+            # Só conta um alerta visível: o portal mantém ".alert-danger" ocultos no DOM.
+            error_locator = self.locs.login.error_message.filter(visible=True).first
 
             # Verifica se o elemento de erro está visível sem esperar mais.
-            if error_locator.is_visible():
-                error_message = error_locator.inner_text().strip()
+            if await error_locator.is_visible():
+                error_message = (await error_locator.inner_text()).strip()
                 logger.error(f"[{self.task_id}] Login falhou com a mensagem: '{error_message}'")
                 raise AuthenticationError(f"Falha no login: {error_message}")
 
@@ -195,37 +221,111 @@ class ISSAuthenticator:
             raise AuthenticationError("Falha no login (Timeout). O portal pode estar instável ou bloqueando o acesso.")
 
         except Exception as e:
+            await self._take_debug_screenshot()
+            if isinstance(e, AuthenticationError):
+                # Já registrada na origem (mensagem do portal, teclado virtual, Cloudflare)
+                raise
             logger.error(
                 f"[{self.task_id}] Erro técnico inesperado durante a autenticação: {str(e)}"
             )
-            self._take_debug_screenshot()
-            if isinstance(e, AuthenticationError):
-                raise
             raise AuthenticationError(f"Erro técnico durante o login: {str(e)}") from e
 
-    def _resolver_teclado_virtual(self, password: str):
+    async def _enviar_credenciais(self):
+        """
+        Clica em "Acessar" e valida o resultado do login.
+
+        A validação só começa depois que o PostBack do login é respondido e, se ele
+        recarregou a página, depois que o novo documento foi montado: um alerta
+        visível de uma tentativa anterior não é lido como recusa da atual.
+
+        Raises:
+            AuthenticationError: Se o portal exibir uma mensagem de erro.
+            PlaywrightTimeoutError: Se nem a tela de empresas nem um erro aparecerem.
+        """
+        logger.debug(f"[{self.task_id}] Clicando no botão de submissão.")
+        # Ouvinte registrado antes do clique: o DOMContentLoaded do novo documento
+        # não se perde mesmo que chegue antes da resposta ser entregue ao robô.
+        documento_novo = asyncio.Event()
+
+        def _on_domcontentloaded(_page):
+            documento_novo.set()
+
+        self.page.on("domcontentloaded", _on_domcontentloaded)
+        try:
+            async with self.page.expect_response(
+                _is_postback, timeout=LOGIN_TIMEOUT
+            ) as response_info:
+                await self.locs.login.submit_button.click()
+            response = await response_info.value
+            if response.request.is_navigation_request():
+                await asyncio.wait_for(documento_novo.wait(), LOGIN_TIMEOUT / 1000)
+        except asyncio.TimeoutError as e:
+            raise PlaywrightTimeoutError(
+                "Página não recarregou após o PostBack do login."
+            ) from e
+        finally:
+            self.page.remove_listener("domcontentloaded", _on_domcontentloaded)
+
+        logger.debug(
+            f"[{self.task_id}] Validando sucesso do login pela presença do filtro de CNPJ..."
+        )
+        # Espera única pelo que vier primeiro: tela de empresas (sucesso) ou
+        # mensagem de erro do portal (credencial recusada, sem aguardar o timeout).
+        # O lado do erro só considera alertas visíveis: um ".alert-danger" oculto
+        # que viesse antes no DOM seria o escolhido pelo .first e a espera expiraria.
+        success_input = self.locs.selecao_empresa.input_filtro_cnpj
+        error_locator = self.locs.login.error_message.filter(visible=True)
+        await success_input.or_(error_locator).first.wait_for(
+            state="visible", timeout=30000
+        )
+        if not await success_input.is_visible():
+            error_message = (await error_locator.first.inner_text()).strip()
+            logger.error(f"[{self.task_id}] Login falhou com a mensagem: '{error_message}'")
+            raise AuthenticationError(f"Falha no login: {error_message}")
+
+    async def _resolver_teclado_virtual(self, password: str):
         """
         Lógica para lidar com o Teclado Virtual, que possui valores dinâmicos.
+        Por padrão a senha é digitada em um único evaluate; com
+        VIRTUAL_KEYBOARD_BATCH desligado, cada dígito é um clique do Playwright.
         """
-        keyboard_map = SELECTORS["login"]["virtual_keyboard"]
         logger.debug(
             f"[{self.task_id}] Processando teclado virtual para senha de {len(password)} dígitos."
         )
 
-        for i, digit in enumerate(password):
+        if VIRTUAL_KEYBOARD_BATCH:
+            missing = await self.page.evaluate(
+                _TECLADO_VIRTUAL_JS, [_KEYBOARD_SELECTORS, list(password)]
+            )
+            if missing is not None:
+                logger.error(
+                    f"[{self.task_id}] Teclado Virtual: Não foi possível encontrar um botão para o dígito '{missing}'."
+                )
+                raise AuthenticationError(
+                    f"Erro no teclado virtual: Dígito '{missing}' não encontrado."
+                )
+        else:
+            await self._clicar_teclado_virtual(password)
+
+        logger.info(f"[{self.task_id}] Teclado virtual processado com sucesso.")
+
+    async def _clicar_teclado_virtual(self, password: str):
+        """Fallback: um clique real (evento confiável) do Playwright por dígito."""
+        keyboard_map = vars(self.locs.login.virtual_keyboard)
+
+        for digit in password:
             clicked = False
-            for btn_key, btn_selector in keyboard_map.items():
+            for btn_key, button in keyboard_map.items():
                 if btn_key == "limpar":
                     continue
 
-                button = self.page.locator(btn_selector)
-                if not button.is_visible():
+                if not await button.is_visible():
                     continue
 
-                btn_value = button.get_attribute("value") or button.inner_text()
+                btn_value = await button.get_attribute("value") or await button.text_content() or ""
                 if digit in btn_value:
-                    button.click()
-                    time.sleep(0.3)
+                    await button.click()
+                    await asyncio.sleep(0.3)
                     clicked = True
                     break
 
@@ -236,5 +336,3 @@ class ISSAuthenticator:
                 raise AuthenticationError(
                     f"Erro no teclado virtual: Dígito '{digit}' não encontrado."
                 )
-
-        logger.info(f"[{self.task_id}] Teclado virtual processado com sucesso.")
@@ -1,34 +1,148 @@
 # -*- coding: utf-8 -*-
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, NamedTuple, Optional
+import asyncio
+import hashlib
+import json
+import os
+import random
 import time
+import shutil
 from pathlib import Path
-from playwright.sync_api import sync_playwright, Browser, BrowserContext, Page
+from types import SimpleNamespace
+
+if TYPE_CHECKING:  # Apenas para anotações; o Playwright é carregado pelos componentes
+    from playwright.async_api import Browser, BrowserContext, Page
+
 from rpa.config_rpa import (
-    CREDENTIALS,
-    BROWSER_CONFIG,
     DEFAULT_TIMEOUT,
+    NAV_WAIT,
     POLLING_MAX_RETRIES,
     POLLING_INTERVAL,
+    POLLING_INTERVAL_MAX,
+    POLLING_TIMEOUT,
+    RPA_MAX_WORKERS,
+    SESSION_STATES_DIR,
+    SESSION_TTL_MINUTES,
+    URLS,
+    RECORD_VIDEO,
+    VIDEOS_DIR,
+    VIDEO_SIZE,
+    VIDEO_TRANSCODE_MP4,
+    ensure_dirs,
+    get_credentials_by_inscricao,
 )
 from rpa.utils import setup_logger
+from rpa.locators import build_locators
+from rpa.browser_pool import CONTEXT_KWARGS, CONTEXT_POOL, PlaywrightPool, configure_context
 from rpa.authentication import ISSAuthenticator
 from rpa.portal_navigator import ISSNavigator
 from rpa.file_uploader import ISSUploader
-from rpa.result_parser import ISSResultParser
-from rpa.error_handler import PortalOfflineError
+from rpa.result_parser import ISSResultParser, classificar_linha
+from rpa.error_handler import AuthenticationError, PortalOfflineError
 
 logger = setup_logger()
 
 
+class Credenciais(NamedTuple):
+    """Credenciais já validadas de uma empresa, resolvidas uma única vez por execução."""
+
+    user: str
+    password: str
+    inscricao: str
+    cnpj: str
+
+
+class RetrySpec(NamedTuple):
+    """Política de retry para uma classe de erro (tabela RETRY_POLICY)."""
+
+    max_retries: int  # Total de tentativas permitidas
+    base_delay: float  # Teto da espera após a 1ª falha (dobra a cada tentativa)
+    max_delay: float  # Teto da espera entre tentativas
+    max_total_wait: float  # Orçamento de espera somado, contado da 1ª falha
+    recoverable: bool = True
+
+
+# Política compartilhada por erros que exigem intervenção humana (e pelo fallback)
+_NO_RETRY = RetrySpec(0, 0.0, 0.0, 0.0, recoverable=False)
+
+# Classificação de erros: classe -> política de retry.
+# Erros de infraestrutura são re-tentados; erros de autenticação exigem intervenção humana.
+# Exceções fora da tabela caem no ramo genérico (sem retry).
+RETRY_POLICY: Dict[type, RetrySpec] = {
+    PortalOfflineError: RetrySpec(3, 2.0, 30.0, 60.0),
+    AuthenticationError: _NO_RETRY,
+}
+
+
+def _retry_spec_for(error: BaseException) -> RetrySpec:
+    """Resolve a política pela classe da exceção, respeitando subclasses (ex: CredentialError)."""
+    for cls in type(error).__mro__:
+        spec = RETRY_POLICY.get(cls)
+        if spec is not None:
+            return spec
+    return _NO_RETRY
+
+
+def _backoff(spec: RetrySpec, attempt: int) -> float:
+    """
+    Full jitter: espera sorteada entre 0 e o teto exponencial (base * 2^(n-1), limitado
+    a max_delay). Robôs paralelos que caíram juntos não voltam ao portal em sincronia.
+    """
+    return random.uniform(0, min(spec.max_delay, spec.base_delay * (2 ** (attempt - 1))))
+
+
+# Mensagens de status enviadas ao frontend; só tentativa/espera são interpoladas.
+_MSG_INICIO = "Iniciando Robô..."
+_MSG_LOGIN = "Realizando Login (Tentativa {})..."
+_MSG_EMPRESA = "Selecionando Empresa..."
+_MSG_UPLOAD = "Enviando Arquivo..."
+_MSG_RESULTADOS = "Lendo Resultados..."
+_MSG_AGUARDANDO = "Importação enviada. Aguardando processamento final..."
+_MSG_CONSULTA = "Consultando processamento ({}/{})..."
+_MSG_CONCLUIDO = "Concluído."
+_MSG_BACKOFF = "Portal instável. Aguardando {:.0f}s..."
+
+
+def _no_status(_msg: str) -> None:
+    """Callback nulo: evita checar `if status_callback` a cada emissão."""
+
+
 class ISSBot:
-    def __init__(self, task_id: str, is_dev_mode: bool = False):
+    """
+    Orquestrador único do fluxo RPA: Login -> Seleção de Empresa -> Upload -> Resultado
+    (com polling na tela de Consulta quando o processamento ainda está pendente).
+
+    O modo de execução (dev/produção) é o único parâmetro de comportamento; batch e
+    chamadas síncronas reutilizam esta mesma classe via run_rpa_batch/run_rpa_process.
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        is_dev_mode: bool = False,
+        creds: Optional[Credenciais] = None,
+        record_video: bool = RECORD_VIDEO,
+    ):
+        """
+        Args:
+            creds (Credenciais, optional): Credenciais já resolvidas pelo chamador.
+                Se omitidas, são buscadas pela Inscrição Municipal em `execute`.
+            record_video (bool): Grava vídeo da sessão (independente do modo dev).
+        """
         self.task_id = task_id
         self.is_dev_mode = is_dev_mode
-        self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
-        self.page: Optional[Page] = None
-
-    def execute(
+        self.record_video = record_video
+        # Contextos do pool são compartilhados: dev (headful, sem bloqueio de recursos)
+        # e gravação de vídeo exigem um contexto dedicado.
+        self._pooled = not (is_dev_mode or record_video)
+        self.browser: Optional["Browser"] = None
+        self.context: Optional["BrowserContext"] = None
+        self.page: Optional["Page"] = None
+        self.locs: Optional[SimpleNamespace] = None
+        self._creds: Optional[Credenciais] = creds
+        self._status: Callable[[str], None] = _no_status
+
+    async def execute(
         self,
         file_path: str,
         inscricao_municipal: str,
@@ -38,207 +152,399 @@ class ISSBot:
     ) -> dict:
         """
         Executa o fluxo RPA completo com política de retry para falhas de infraestrutura.
+        Assíncrono: esperas (backoff, polling) liberam o event loop para outros robôs.
         :param status_callback: Função opcional (fn(msg)) para reportar progresso.
         """
         logger.info(f"[{self.task_id}] Iniciando Robô. IM: {inscricao_municipal}")
-        if status_callback:
-            status_callback("Iniciando Robô...")
+        self._status = status_callback or _no_status
+        self._status(_MSG_INICIO)
 
-        creds = CREDENTIALS.get(str(inscricao_municipal))
-        if not creds:
-            msg = f"Credenciais não achadas p/ {inscricao_municipal}"
-            logger.error(f"[{self.task_id}] {msg}")
-            return {"success": False, "message": msg}
+        # Resolve e valida as credenciais antes do loop de retry:
+        # credenciais ausentes/incompletas falham na hora, sem abrir o navegador.
+        if self._creds is None:
+            error = self._resolve_credentials(inscricao_municipal)
+            if error:
+                return error
 
-        max_retries = 3
         attempt = 0
-        backoff_base = 2  # Segundos
+        deadline = None  # Instante (monotonic) em que o orçamento de espera se esgota
+        healthy = False  # Contexto só volta ao pool se a tarefa terminou normalmente
+        self.context = self.page = None
+
+        try:
+            while True:
+                attempt += 1
+                try:
+                    warm_competencia = await self._open_session(inscricao_municipal)
+                    nav = ISSNavigator(self.page, self.task_id, self.locs)
+
+                    # Sessão recente da mesma IM e competência: vai direto à Importação.
+                    resumed = (
+                        warm_competencia == f"{mes}/{ano}"
+                        and await self._resume_session(inscricao_municipal)
+                    )
 
-        while attempt < max_retries:
-            attempt += 1
-            playwright = None
-            try:
-                playwright = sync_playwright().start()
+                    if not resumed:
+                        # FASE 1: LOGIN
+                        self._status(_MSG_LOGIN.format(attempt))
 
-                launch_config = BROWSER_CONFIG.copy()
-                if self.is_dev_mode:
-                    launch_config["headless"] = False
+                        auth = ISSAuthenticator(self.page, self.task_id, self.locs)
+                        if not await auth.login(self._creds.user, self._creds.password):
+                            # Login falhou, mas não lançou exceção (retornou False).
+                            # Consideramos erro de negócio (senha errada), então não retry.
+                            raise Exception("Falha na etapa de autenticação (Login recusado).")
 
-                self.browser = playwright.chromium.launch(**launch_config)
+                        # FASE 2: SELEÇÃO DE EMPRESA
+                        self._status(_MSG_EMPRESA)
 
-                record_dir = None
-                if self.is_dev_mode:
-                    record_dir = f"rpa_logs/videos/{self.task_id}"
+                        await nav.select_contribuinte(inscricao_municipal, self._creds.cnpj, mes, ano)
 
-                self.context = self.browser.new_context(
-                    record_video_dir=record_dir, viewport={"width": 1280, "height": 720}
-                )
-                self.page = self.context.new_page()
-                self.page.set_default_timeout(DEFAULT_TIMEOUT)
+                        # FASE 2.5: NAVEGAÇÃO PARA IMPORTAÇÃO
+                        # Garante que o robô esteja na página correta antes de tentar upload
+                        await nav.navigate_to_import_page()
 
-                # FASE 1: LOGIN
-                if status_callback:
-                    status_callback(f"Realizando Login (Tentativa {attempt})...")
+                    # FASE 3: UPLOAD
+                    self._status(_MSG_UPLOAD)
 
-                user = creds.get("user")
-                password = creds.get("pass")
-                inscricao = creds.get("inscricao")
+                    uploader = ISSUploader(self.page, self.task_id, self.locs)
+                    await uploader.upload_file(file_path)
 
-                if not user or not password or not inscricao:
-                    raise ValueError(
-                        f"Credenciais incompletas para {inscricao_municipal} (Usuário, Senha ou Inscrição vazios)."
-                    )
+                    # FASE 4: RESULTADOS
+                    self._status(_MSG_RESULTADOS)
 
-                auth = ISSAuthenticator(self.page, self.task_id)
-                if not auth.login(user, password):
-                    # Login falhou, mas não lançou exceção (retornou False).
-                    # Consideramos erro de negócio (senha errada), então não retry.
-                    raise Exception("Falha na etapa de autenticação (Login recusado).")
-
-                # FASE 2: SELEÇÃO DE EMPRESA
-                if status_callback:
-                    status_callback("Selecionando Empresa...")
-
-                # Recupera o CNPJ para a seleção de empresa
-                cnpj = creds.get("cnpj")
-                if not cnpj:
-                    raise ValueError(
-                        f"CNPJ não encontrado nas credenciais para a Inscrição Municipal {inscricao_municipal}."
+                    parser = ISSResultParser(self.page, self.task_id, self.locs)
+                    # Caminho rápido: se o portal já exibiu o resultado final logo após
+                    # o upload, não é preciso navegar até a Consulta.
+                    resultado = await parser.try_parse_immediate()
+
+                    if resultado is None:
+                        self._status(_MSG_AGUARDANDO)
+
+                        await nav.ir_para_consulta()
+                        tracked_file = Path(file_path).name
+                        resultado = await self._poll_consulta_status(
+                            navigator=nav,
+                            parser=parser,
+                            tracked_filename=tracked_file,
+                        )
+
+                    if resultado.get("success"):
+                        await self._save_session_state(inscricao_municipal, f"{mes}/{ano}")
+
+                    self._status(_MSG_CONCLUIDO)
+
+                    healthy = True
+                    return resultado
+
+                except tuple(RETRY_POLICY) as e:
+                    spec = _retry_spec_for(e)
+                    if not spec.recoverable:
+                        # ERRO NÃO RECUPERÁVEL (ex: Autenticação) -> ABORTA
+                        return self._fail(e)
+
+                    # ERRO DE INFRAESTRUTURA -> RETRY
+                    logger.warning(
+                        f"[{self.task_id}] Portal offline ou instável (Tentativa {attempt}/{spec.max_retries}): {e}"
                     )
+                    if deadline is None:
+                        deadline = time.monotonic() + spec.max_total_wait
+                    remaining = deadline - time.monotonic()
+
+                    if attempt >= spec.max_retries or remaining <= 0:
+                        logger.error(f"[{self.task_id}] Esgotadas tentativas de conexão.")
+                        return {
+                            "success": False,
+                            "message": "Erro de Infraestrutura: Portal indisponível após múltiplas tentativas.",
+                            "details": str(e),
+                        }
+
+                    # Backoff Exponencial com jitter, sem estourar o orçamento total
+                    wait_time = min(_backoff(spec, attempt), remaining)
+                    self._status(_MSG_BACKOFF.format(wait_time))
+
+                    # Contexto e página são mantidos: a próxima tentativa recomeça o
+                    # fluxo navegando na mesma página (ver _open_session).
+                    await asyncio.sleep(wait_time)
+                    continue  # Tenta novamente
+
+                except Exception as e:
+                    # ERRO GERAL (Negócio, Código) -> ABORTA
+                    return self._fail(e)
+
+        finally:
+            await self._close_session(self.context, discard=not healthy)
+            self.context = self.page = None
+
+    def _resolve_credentials(self, inscricao_municipal: str) -> Optional[dict]:
+        """
+        Busca e valida as credenciais da IM, guardando-as em `self._creds`.
+        Retorna o dicionário de falha se estiverem ausentes ou incompletas.
+        """
+        creds = get_credentials_by_inscricao(inscricao_municipal)
+        if not creds:
+            msg = f"Credenciais não achadas p/ {inscricao_municipal}"
+            logger.error(f"[{self.task_id}] {msg}")
+            return {"success": False, "message": msg}
 
-                nav = ISSNavigator(self.page, self.task_id)
-                nav.select_contribuinte(inscricao_municipal, cnpj, mes, ano)
+        user = creds.get("user")
+        password = creds.get("pass")
+        inscricao = creds.get("inscricao")
+        cnpj = creds.get("cnpj")
 
-                # FASE 2.5: NAVEGAÇÃO PARA IMPORTAÇÃO
-                # Garante que o robô esteja na página correta antes de tentar upload
-                nav.navigate_to_import_page()
+        if not all([user, password, inscricao, cnpj]):
+            msg = (
+                f"Credenciais incompletas para {inscricao_municipal} "
+                "(Usuário, Senha, Inscrição ou CNPJ vazios)."
+            )
+            logger.error(f"[{self.task_id}] {msg}")
+            return {"success": False, "message": msg}
 
-                # FASE 3: UPLOAD
-                if status_callback:
-                    status_callback("Enviando Arquivo...")
+        self._creds = Credenciais(user, password, inscricao, cnpj)
+        return None
 
-                uploader = ISSUploader(self.page, self.task_id)
-                uploader.upload_file(file_path)
+    async def _open_session(self, inscricao_municipal: str) -> Optional[str]:
+        """
+        Prólogo único de cada tentativa: obtém um contexto sobre o Chromium compartilhado
+        e abre uma página nova (o navegador sobrevive entre tarefas e retries).
 
-                # FASE 4: RESULTADOS
-                if status_callback:
-                    status_callback("Lendo Resultados...")
+        Em um retry, se a página da tentativa anterior ainda está viva, ela é reaproveitada:
+        apenas os cookies são limpos e o login recomeça navegando nela, sem criar
+        contexto nem página. Se a página ou o navegador caíram, o contexto é descartado.
 
-                parser = ISSResultParser(self.page, self.task_id)
-                resultado = parser.parse()
+        Em produção o contexto vem aquecido do CONTEXT_POOL. Em dev ou com gravação
+        de vídeo é criado na hora, pois o vídeo só pode ser definido na criação do contexto.
+        Em seguida os cookies salvos na última execução bem-sucedida desta Inscrição
+        Municipal são reaplicados (inclui a liberação do Cloudflare).
 
-                result_state = resultado.get("state", "unknown")
-                if result_state in ("pending", "unknown"):
-                    if status_callback:
-                        status_callback("Importação enviada. Aguardando processamento final...")
+        Returns:
+            Optional[str]: Competência ("mes/ano") da sessão salva, se ela ainda estiver
+            dentro de SESSION_TTL_MINUTES; None caso contrário.
+        """
+        if self.page is not None:
+            if not self.page.is_closed() and self.browser.is_connected():
+                logger.debug(f"[{self.task_id}] Reaproveitando a página da tentativa anterior.")
+                await self.context.clear_cookies()
+                return None
+            await self._close_session(self.context, discard=True)
+            self.context = self.page = None
+
+        logger.debug(f"[{self.task_id}] Abrindo contexto de navegação...")
+
+        if self._pooled:
+            self.context = await CONTEXT_POOL.acquire()
+        else:
+            browser = await PlaywrightPool.get_browser(self.is_dev_mode)
+            video_options = {}
+            if self.record_video:
+                video_options = {
+                    "record_video_dir": str(VIDEOS_DIR / self.task_id),
+                    "record_video_size": VIDEO_SIZE,
+                }
+            self.context = await browser.new_context(**CONTEXT_KWARGS, **video_options)
+            await configure_context(self.context, self.is_dev_mode)
+        self.browser = self.context.browser
+
+        warm_competencia = await self._restore_session_state(inscricao_municipal)
+        self.page = await self.context.new_page()
+        self.locs = build_locators(self.page)
+        self.page.set_default_timeout(DEFAULT_TIMEOUT)
+        return warm_competencia
+
+    async def _close_session(
+        self, context: Optional["BrowserContext"], discard: bool = False
+    ) -> None:
+        """
+        Encerra o contexto da tentativa (o Chromium compartilhado continua vivo).
+        Em produção o contexto volta limpo ao pool, ou é descartado se `discard`.
+        Falhas no cleanup são apenas registradas: nunca mascaram o resultado da tarefa.
+        """
+        if not context:
+            return
 
-                    nav.ir_para_consulta()
-                    tracked_file = Path(file_path).name
-                    resultado = self._poll_consulta_status(
-                        navigator=nav,
-                        parser=parser,
-                        tracked_filename=tracked_file,
-                        status_callback=status_callback,
-                    )
+        logger.info(f"[{self.task_id}] Encerrando sessão (Cleanup da tentativa).")
+        if self._pooled:
+            await CONTEXT_POOL.release(context, discard=discard)
+            return
 
-                if status_callback:
-                    status_callback("Concluído.")
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"[{self.task_id}] Falha no cleanup da sessão: {e}")
 
-                return resultado
+        if self.record_video and VIDEO_TRANSCODE_MP4:
+            await self._transcode_videos(VIDEOS_DIR / self.task_id)
 
-            except PortalOfflineError as e:
-                # ERRO DE INFRAESTRUTURA -> RETRY
-                logger.warning(
-                    f"[{self.task_id}] Portal offline ou instável (Tentativa {attempt}/{max_retries}): {e}"
-                )
-                if attempt >= max_retries:
-                    logger.error(f"[{self.task_id}] Esgotadas tentativas de conexão.")
-                    return {
-                        "success": False,
-                        "message": "Erro de Infraestrutura: Portal indisponível após múltiplas tentativas.",
-                        "details": str(e),
-                    }
+    async def _restore_session_state(self, inscricao_municipal: str) -> Optional[str]:
+        """
+        Reaplica no contexto os cookies salvos para esta Inscrição Municipal, se houver.
+        Retorna a competência da sessão quando ela ainda está dentro do TTL.
+        """
+        state_path = SESSION_STATES_DIR / f"{inscricao_municipal}.json"
+        try:
+            age_seconds = time.time() - state_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+        try:
+            state = json.loads(state_path.read_text(encoding="utf-8"))
+            await self.context.add_cookies(state.get("cookies", []))
+            logger.debug(f"[{self.task_id}] Sessão restaurada de {state_path.name}.")
+        except Exception as e:
+            # Arquivo corrompido/incompatível: descarta e segue com sessão limpa
+            logger.warning(f"[{self.task_id}] Sessão salva inválida, descartando: {e}")
+            state_path.unlink(missing_ok=True)
+            return None
+
+        if age_seconds > SESSION_TTL_MINUTES * 60:
+            return None
+        return state.get("competencia")
+
+    async def _resume_session(self, inscricao_municipal: str) -> bool:
+        """
+        Tenta reaproveitar a sessão restaurada abrindo direto a tela de Importação.
+        Se o portal redirecionar para o login (sessão expirada), apaga a sessão salva
+        desta IM (as próximas execuções não a restauram de novo), retorna False e o
+        fluxo completo de login/seleção é executado na mesma página.
+        """
+        try:
+            await self.page.goto(URLS["importacao"], wait_until=NAV_WAIT)
+            await self.locs.importacao.input_arquivo.wait_for(state="visible", timeout=5000)
+        except Exception as e:
+            logger.info(f"[{self.task_id}] Sessão salva expirada; realizando login completo. ({e})")
+            (SESSION_STATES_DIR / f"{inscricao_municipal}.json").unlink(missing_ok=True)
+            return False
+
+        logger.info(f"[{self.task_id}] ♻️ Sessão reaproveitada: login e seleção de empresa pulados.")
+        return True
+
+    async def _save_session_state(self, inscricao_municipal: str, competencia: str) -> None:
+        """
+        Persiste o storage_state do contexto (mais a competência selecionada) para
+        reaproveitar na próxima execução.
 
-                # Backoff Exponencial
-                wait_time = backoff_base ** attempt
-                if status_callback:
-                    status_callback(f"Portal instável. Aguardando {wait_time}s...")
-                time.sleep(wait_time)
-                continue  # Tenta novamente
+        O arquivo contém os cookies de sessão do portal: é criado (e mantido) com
+        permissão somente do dono (0o600).
+        """
+        state_path = SESSION_STATES_DIR / f"{inscricao_municipal}.json"
+        try:
+            state = await self.context.storage_state()
+            state["competencia"] = competencia
+            fd = os.open(state_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                # Arquivo de versões anteriores pode ter sido criado com a umask padrão
+                os.chmod(state_path, 0o600)
+                f.write(json.dumps(state))
+        except Exception as e:
+            logger.warning(f"[{self.task_id}] Não foi possível salvar a sessão: {e}")
+
+    async def _transcode_videos(self, video_dir: Path) -> None:
+        """
+        Converte os vídeos WebM da tarefa para MP4 (ffmpeg -crf 28) e remove os originais,
+        mantendo o uso de disco controlado. Ignorado se o ffmpeg não estiver instalado.
+        """
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg or not video_dir.is_dir():
+            return
 
+        for webm in video_dir.glob("*.webm"):
+            mp4 = webm.with_suffix(".mp4")
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    ffmpeg, "-y", "-loglevel", "error", "-i", str(webm),
+                    "-crf", "28", str(mp4),
+                )
+                if await proc.wait() == 0:
+                    webm.unlink(missing_ok=True)
             except Exception as e:
-                # ERRO GERAL (Negócio, Código, Autenticação) -> ABORTA
-                logger.exception(f"[{self.task_id}] Erro fatal durante execução")
-                return {
-                    "success": False,
-                    "message": f"Erro técnico: {str(e)}",
-                    "details": "Consulte os logs técnicos.",
-                }
+                logger.warning(f"[{self.task_id}] Falha ao converter vídeo {webm.name}: {e}")
 
-            finally:
-                logger.info(f"[{self.task_id}] Encerrando sessão (Cleanup da tentativa).")
-                if self.context:
-                    self.context.close()
-                if self.browser:
-                    self.browser.close()
-                if playwright:
-                    playwright.stop()
+    def _fail(self, error: Exception) -> dict:
+        """Registra o erro fatal e monta o retorno padrão de falha (sem retry)."""
+        logger.exception(f"[{self.task_id}] Erro fatal durante execução")
+        return {
+            "success": False,
+            "message": f"Erro técnico: {str(error)}",
+            "details": "Consulte os logs técnicos.",
+        }
 
-    def _poll_consulta_status(
+    async def _poll_consulta_status(
         self,
         navigator: ISSNavigator,
         parser: ISSResultParser,
         tracked_filename: str,
-        status_callback=None,
     ) -> dict:
         """
         Realiza polling finito na tela de consulta até estado terminal.
         Evita loops infinitos e retorna sucesso/erro definitivo ou timeout controlado.
+
+        O intervalo dobra a cada consulta (POLLING_INTERVAL -> POLLING_INTERVAL_MAX):
+        resultados rápidos são vistos em segundos, e arquivos lentos geram poucas
+        consultas ao portal dentro do orçamento POLLING_TIMEOUT.
         """
         last_status = "Aguardando"
         last_details = ""
+        last_fingerprint: Optional[bytes] = None
+        deadline = time.monotonic() + POLLING_TIMEOUT
+        interval = POLLING_INTERVAL
 
         for attempt in range(1, POLLING_MAX_RETRIES + 1):
-            if status_callback:
-                status_callback(
-                    f"Consultando processamento ({attempt}/{POLLING_MAX_RETRIES})..."
-                )
+            self._status(_MSG_CONSULTA.format(attempt, POLLING_MAX_RETRIES))
 
             try:
-                navigator.atualizar_grid()
+                await navigator.atualizar_grid()
             except Exception as nav_error:
                 logger.warning(
                     f"[{self.task_id}] Falha ao atualizar grid na tentativa {attempt}: {nav_error}"
                 )
 
-            current_status = parser.ler_status_processamento(tracked_filename)
-            status_lower = current_status.lower()
-            last_status = current_status
+            # Fingerprint da linha do arquivo: se a grid não mudou desde a última
+            # leitura, não há o que reinterpretar; apenas aguarda o próximo ciclo.
+            row_snapshot = await parser.ler_texto_linha(tracked_filename)
+            fingerprint = hashlib.sha1(row_snapshot.encode("utf-8")).digest()
 
-            if "sucesso" in status_lower or "êxito" in status_lower:
-                return {
-                    "success": True,
-                    "message": "Processado com Sucesso!",
-                    "details": current_status,
-                    "state": "success",
-                }
+            if fingerprint == last_fingerprint:
+                logger.debug(
+                    f"[{self.task_id}] Grid inalterada desde a última leitura. Pulando análise."
+                )
+            else:
+                last_fingerprint = fingerprint
+                # A linha já foi capturada para o fingerprint: classifica localmente,
+                # sem uma segunda varredura da grid no navegador.
+                if row_snapshot:
+                    logger.info(f"[{self.task_id}] Linha do arquivo na consulta: {row_snapshot.strip()}")
+                    current_status = classificar_linha(row_snapshot)
+                else:
+                    current_status = "NOT_FOUND"
+                status_lower = current_status.lower()
+                last_status = current_status
+
+                if "sucesso" in status_lower or "êxito" in status_lower:
+                    return {
+                        "success": True,
+                        "message": "Processado com Sucesso!",
+                        "details": current_status,
+                        "state": "success",
+                    }
 
-            if "erro" in status_lower:
-                return {
-                    "success": False,
-                    "message": "Processado com Erros.",
-                    "details": current_status,
-                    "state": "error",
-                }
+                if "erro" in status_lower:
+                    return {
+                        "success": False,
+                        "message": "Processado com Erros.",
+                        "details": current_status,
+                        "state": "error",
+                    }
 
-            if current_status in ("NOT_FOUND", "ERROR"):
-                last_details = (
-                    "Arquivo não encontrado na consulta ainda. "
-                    "Pode haver atraso no processamento da prefeitura."
-                )
+                if current_status in ("NOT_FOUND", "ERROR"):
+                    last_details = (
+                        "Arquivo não encontrado na consulta ainda. "
+                        "Pode haver atraso no processamento da prefeitura."
+                    )
 
-            if attempt < POLLING_MAX_RETRIES:
-                time.sleep(POLLING_INTERVAL)
+            remaining = deadline - time.monotonic()
+            if attempt >= POLLING_MAX_RETRIES or remaining <= 0:
+                break
+            await asyncio.sleep(min(interval, remaining))
+            interval = min(interval * 2, POLLING_INTERVAL_MAX)
 
         timeout_details = (
             last_details
@@ -260,6 +566,74 @@ def run_rpa_process(
     mes: str = "",
     ano: str = "",
     status_callback=None,
+    record_video: bool = RECORD_VIDEO,
 ):
-    bot = ISSBot(task_id, is_dev_mode)
-    return bot.execute(file_path, inscricao_municipal, mes, ano, status_callback)
+    """
+    Ponto de entrada síncrono (compatível com as threads do Flask).
+    Executa o robô no event loop do pool, reaproveitando o Chromium já aberto.
+    """
+    ensure_dirs()
+    bot = ISSBot(task_id, is_dev_mode, record_video=record_video)
+    return PlaywrightPool.run(
+        bot.execute(file_path, inscricao_municipal, mes, ano, status_callback)
+    )
+
+
+def run_rpa_batch(tasks: List[Dict], max_workers: Optional[int] = None) -> List[dict]:
+    """
+    Executa várias Inscrições Municipais em paralelo em um único event loop.
+
+    Cada tarefa é um dicionário com os mesmos argumentos de `run_rpa_process`
+    (task_id, file_path, inscricao_municipal, mes, ano, ...). Enquanto um robô
+    aguarda o portal (backoff, polling), os demais continuam progredindo.
+
+    Todas as tarefas compartilham o mesmo Chromium (um contexto por tarefa); o
+    número de workers é limitado por RPA_MAX_WORKERS para conter RAM e a carga
+    sobre o portal.
+
+    Returns:
+        list[dict]: Resultados na mesma ordem das tarefas recebidas.
+    """
+    if not tasks:
+        return []
+
+    ensure_dirs()
+
+    workers = min(max_workers or RPA_MAX_WORKERS, RPA_MAX_WORKERS, len(tasks))
+    logger.info(f"Iniciando lote RPA: {len(tasks)} tarefa(s), {workers} worker(s).")
+
+    return PlaywrightPool.run(_run_batch_async(tasks, workers))
+
+
+async def _run_batch_async(tasks: List[Dict], workers: int) -> List[dict]:
+    """Dispara as tarefas com asyncio.gather, limitando a concorrência por semáforo."""
+    semaphore = asyncio.Semaphore(workers)
+
+    async def _run_one(task: Dict) -> dict:
+        async with semaphore:
+            bot = ISSBot(
+                task["task_id"],
+                task.get("is_dev_mode", False),
+                record_video=task.get("record_video", RECORD_VIDEO),
+            )
+            return await bot.execute(
+                task["file_path"],
+                task["inscricao_municipal"],
+                task.get("mes", ""),
+                task.get("ano", ""),
+                task.get("status_callback"),
+            )
+
+    results = await asyncio.gather(
+        *(_run_one(task) for task in tasks), return_exceptions=True
+    )
+    # Uma tarefa malformada (ex: chave ausente) não derruba os resultados das demais
+    for i, result in enumerate(results):
+        if isinstance(result, Exception):
+            logger.error(f"Tarefa {i} do lote falhou antes de iniciar o robô: {result!r}")
+            results[i] = {
+                "success": False,
+                "message": f"Erro técnico: {result}",
+                "details": "Consulte os logs técnicos.",
+            }
+    return results
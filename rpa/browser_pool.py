@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de Navegadores (rpa/browser_pool.py).
+
+Responsabilidade:
+1. Manter um único driver Playwright e um Chromium vivos durante todo o processo.
+2. Entregar BrowserContexts já aquecidos às tarefas (acquire/release), limitando a concorrência.
+3. Encerrar tudo de forma ordenada na saída do processo (atexit).
+"""
+import asyncio
+import atexit
+import threading
+from typing import Dict, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Route
+
+from rpa.config_rpa import (
+    BLOCK_RESOURCES,
+    BLOCKED_RESOURCE_TYPES,
+    BLOCKED_URL_PATTERN,
+    ACCEPT_LANGUAGE,
+    BROWSER_CONFIG,
+    RPA_MAX_WORKERS,
+    STEALTH_SCRIPT,
+)
+from rpa.utils import setup_logger
+
+logger = setup_logger("rpa_browser_pool")
+
+# Configurações de lançamento pré-calculadas por modo (chave: is_dev_mode).
+# Em dev o navegador é sempre visível; evita copiar/mutar BROWSER_CONFIG a cada tentativa.
+LAUNCH_CONFIG: Dict[bool, dict] = {
+    True: {**BROWSER_CONFIG, "headless": False},
+    False: dict(BROWSER_CONFIG),
+}
+
+# Opções fixas de todo contexto; gravação de vídeo e sessão salva são somadas por tarefa.
+# Sem user_agent: o padrão do Playwright acompanha a versão do Chromium empacotado,
+# coerente com os client hints (sec-ch-ua) que o navegador envia.
+CONTEXT_KWARGS: Dict[str, object] = {
+    "viewport": {"width": 1280, "height": 720},
+    "locale": "pt-BR",
+    "extra_http_headers": {"Accept-Language": ACCEPT_LANGUAGE},
+}
+
+
+async def _abort_heavy_resources(route: Route) -> None:
+    """
+    Handler de BLOCKED_URL_PATTERN: aborta imagens/fontes/mídia e chamadas de analytics.
+    Navegações de documento nunca são bloqueadas, mesmo que a URL case com o padrão.
+    """
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or not request.is_navigation_request():
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def configure_context(context: BrowserContext, is_dev_mode: bool = False) -> BrowserContext:
+    """
+    Injeta o script anti-detecção (uma vez por contexto, vale para todas as páginas)
+    e, fora do modo dev, aplica as otimizações de rede.
+    """
+    await context.add_init_script(path=str(STEALTH_SCRIPT))
+    if BLOCK_RESOURCES and not is_dev_mode:
+        await context.route(BLOCKED_URL_PATTERN, _abort_heavy_resources)
+    return context
+
+
+class PlaywrightPool:
+    """
+    Playwright + Chromium compartilhados por todo o processo.
+
+    Subir o driver Node e o Chromium custa alguns segundos; aqui isso acontece uma
+    única vez e cada tarefa/tentativa recebe apenas um BrowserContext. Como objetos do
+    Playwright assíncrono ficam presos ao event loop que os criou, o pool mantém um
+    loop dedicado em uma thread daemon e as chamadas síncronas (threads do Flask)
+    submetem suas corrotinas a ele.
+    """
+
+    _lock = threading.Lock()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[threading.Thread] = None
+    _playwright = None
+    _browsers: Dict[bool, Browser] = {}  # Chave: is_dev_mode (headful em dev)
+    _launch_lock: Optional[asyncio.Lock] = None
+    _atexit_registered = False
+
+    @classmethod
+    def _get_loop(cls) -> asyncio.AbstractEventLoop:
+        with cls._lock:
+            if cls._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="rpa-playwright-loop", daemon=True
+                )
+                thread.start()
+                cls._loop, cls._thread = loop, thread
+                if not cls._atexit_registered:
+                    atexit.register(cls.shutdown)
+                    cls._atexit_registered = True
+            return cls._loop
+
+    @classmethod
+    def run(cls, coro):
+        """Executa a corrotina no loop do pool e bloqueia a thread chamadora até o fim."""
+        return asyncio.run_coroutine_threadsafe(coro, cls._get_loop()).result()
+
+    @classmethod
+    async def get_browser(cls, is_dev_mode: bool) -> Browser:
+        """Retorna o Chromium compartilhado, iniciando (ou reiniciando após crash) sob demanda."""
+        if cls._launch_lock is None:
+            cls._launch_lock = asyncio.Lock()
+
+        async with cls._launch_lock:
+            browser = cls._browsers.get(is_dev_mode)
+            if browser is not None and browser.is_connected():
+                return browser
+
+            if cls._playwright is None:
+                logger.info("Iniciando Playwright compartilhado...")
+                cls._playwright = await async_playwright().start()
+
+            logger.info(f"Lançando Chromium compartilhado (dev={is_dev_mode})...")
+            browser = await cls._playwright.chromium.launch(**LAUNCH_CONFIG[is_dev_mode])
+            cls._browsers[is_dev_mode] = browser
+            return browser
+
+    @classmethod
+    async def _close_all(cls) -> None:
+        await CONTEXT_POOL.close_idle()
+        for browser in list(cls._browsers.values()):
+            try:
+                await browser.close()
+            except Exception as e:
+                logger.warning(f"Falha ao fechar Chromium compartilhado: {e}")
+        cls._browsers.clear()
+        if cls._playwright is not None:
+            try:
+                await cls._playwright.stop()
+            except Exception as e:
+                logger.warning(f"Falha ao encerrar Playwright compartilhado: {e}")
+            cls._playwright = None
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Fecha navegadores e Playwright e encerra o loop (registrado no atexit)."""
+        with cls._lock:
+            loop, thread = cls._loop, cls._thread
+            cls._loop = cls._thread = None
+        if loop is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(cls._close_all(), loop).result(timeout=30)
+        except Exception as e:
+            logger.warning(f"Falha no encerramento do pool Playwright: {e}")
+        finally:
+            cls._launch_lock = None
+            CONTEXT_POOL.reset()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            loop.close()
+
+
+class BrowserContextPool:
+    """
+    Pool limitado de BrowserContexts sobre o Chromium compartilhado (modo produção).
+
+    Contextos devolvidos com `release` são limpos (páginas, cookies, storage e
+    permissões) e ficam de reserva para a próxima tarefa; contextos suspeitos
+    (ex: portal caiu no meio do fluxo) são descartados e repostos em segundo plano.
+    Todos os métodos rodam no loop do PlaywrightPool.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: List[BrowserContext] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._warmed = False
+        self._background: set = set()  # Referências às tasks de reposição (evita GC precoce)
+
+    def _in_background(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def reset(self) -> None:
+        """Esquece contextos e primitivas presos a um loop já encerrado."""
+        self._idle.clear()
+        self._background.clear()
+        self._semaphore = None
+        self._warmed = False
+
+    async def _new_context(self) -> BrowserContext:
+        browser = await PlaywrightPool.get_browser(False)
+        return await configure_context(await browser.new_context(**CONTEXT_KWARGS))
+
+    async def _spawn_spare(self) -> None:
+        """Cria um contexto de reserva (chamado em segundo plano)."""
+        if len(self._idle) >= self.size:
+            return
+        try:
+            self._idle.append(await self._new_context())
+        except Exception as e:
+            logger.warning(f"Falha ao aquecer contexto de reserva: {e}")
+
+    async def acquire(self, timeout: Optional[float] = None) -> BrowserContext:
+        """
+        Obtém um contexto limpo, bloqueando enquanto `size` contextos estiverem em uso.
+
+        Raises:
+            asyncio.TimeoutError: Se nenhum contexto for liberado dentro de `timeout` segundos.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+        await asyncio.wait_for(self._semaphore.acquire(), timeout)
+
+        try:
+            if not self._warmed:
+                # Primeira tarefa: aquece as reservas sem atrasar quem pediu
+                self._warmed = True
+                for _ in range(self.size - 1):
+                    self._in_background(self._spawn_spare())
+
+            while self._idle:
+                context = self._idle.pop()
+                if context.browser and context.browser.is_connected():
+                    return context
+            return await self._new_context()
+        except BaseException:
+            self._semaphore.release()
+            raise
+
+    async def release(self, context: BrowserContext, discard: bool = False) -> None:
+        """
+        Devolve o contexto ao pool. Com `discard=True` ele é fechado e uma reserva
+        nova é criada em segundo plano.
+        """
+        try:
+            if not discard:
+                try:
+                    for page in context.pages:
+                        try:
+                            await page.evaluate("() => { localStorage.clear(); sessionStorage.clear(); }")
+                        except Exception:
+                            pass  # Página fora da origem do portal (ex: about:blank)
+                        await page.close()
+                    await context.clear_cookies()
+                    await context.clear_permissions()
+                    self._idle.append(context)
+                    return
+                except Exception as e:
+                    logger.warning(f"Falha ao limpar contexto; descartando: {e}")
+
+            try:
+                await context.close()
+            except Exception as e:
+                logger.warning(f"Falha ao fechar contexto descartado: {e}")
+            self._in_background(self._spawn_spare())
+        finally:
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    async def close_idle(self) -> None:
+        """Fecha os contextos de reserva (usado no encerramento do processo)."""
+        while self._idle:
+            try:
+                await self._idle.pop().close()
+            except Exception:
+                pass
+
+
+CONTEXT_POOL = BrowserContextPool(RPA_MAX_WORKERS)
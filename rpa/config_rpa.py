@@ -6,44 +6,64 @@ Centraliza constantes, URLs, caminhos de diretórios e seletores CSS.
 Define a arquitetura de acesso a credenciais multi-empresa.
 """
 # Importações de tipagem para código limpo e type-checking robusto (PEP 484)
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Mapping, Optional, Tuple
 
 import os
+import re
+import sys
 import csv
+import unicodedata
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from dotenv import load_dotenv
 
+# --- Diretórios do Projeto (fonte única em rpa._paths) ---
+from rpa._paths import (
+    DEBUG_SCREENSHOTS_DIR,
+    DOWNLOADS_DIR,
+    EXECUTION_LOGS_DIR,
+    LOGS_DIR,
+    PROJECT_ROOT,
+    RPA_DIR,
+    SESSION_STATES_DIR,
+    _ensure_dirs,
+)
 from rpa.utils import setup_logger
 
-# Carrega as variáveis de ambiente do arquivo .env na raiz
-load_dotenv()
-
-# --- Diretórios do Projeto ---
-# Define a raiz do projeto voltando dois níveis a partir deste arquivo
-PROJECT_ROOT = Path(__file__).resolve().parent.parent
-RPA_DIR = Path(__file__).resolve().parent
+# Carrega as variáveis de ambiente do arquivo .env na raiz (uma vez por processo).
+# A marca fica no módulo, e não em os.environ: processos filhos (driver do
+# Playwright, ffmpeg, workers) não a herdam e carregam o próprio .env. Em um
+# importlib.reload o dict do módulo é mantido, então a marca sobrevive.
+if not globals().get("_dotenv_loaded"):
+    load_dotenv()
+    _dotenv_loaded = True
 
-# Estrutura de Logs (Apenas Textuais)
-LOGS_DIR = PROJECT_ROOT / "rpa_logs"
-EXECUTION_LOGS_DIR = LOGS_DIR / "execution_logs"
-DEBUG_SCREENSHOTS_DIR = LOGS_DIR / "debug_screenshots"
-# Garante que os diretórios de log existam
-LOGS_DIR.mkdir(exist_ok=True)
-EXECUTION_LOGS_DIR.mkdir(exist_ok=True)
-DEBUG_SCREENSHOTS_DIR.mkdir(exist_ok=True)
+# Retrato do ambiente (já com o .env aplicado): as leituras abaixo vão a um dict
+# comum em vez do proxy os.environ.
+_env: Dict[str, str] = dict(os.environ)
 
 logger = setup_logger("rpa_config")
 
-# Diretório de downloads/uploads (onde ficam os arquivos TXT gerados)
-DOWNLOADS_DIR = PROJECT_ROOT / "downloads"
-# É crucial garantir a existência do diretório de downloads/uploads para evitar erros de I/O.
-DOWNLOADS_DIR.mkdir(exist_ok=True)
+
+@lru_cache(maxsize=1)
+def ensure_dirs() -> None:
+    """
+    Cria os diretórios de logs, screenshots, sessões e downloads.
+
+    Chamada explicitamente na subida da aplicação e nos pontos de entrada do robô
+    (não no import); a memoização garante que os mkdir rodem uma vez por processo.
+    """
+    _ensure_dirs(
+        (EXECUTION_LOGS_DIR, DEBUG_SCREENSHOTS_DIR, SESSION_STATES_DIR, DOWNLOADS_DIR)
+    )
 
 
 # --- Configurações do Portal ISS.net ---
 
 # Renomeado de ISSNET_LOGIN_URL para ISSNET_URL para compatibilidade com __init__.py
-ISSNET_URL = os.getenv(
+ISSNET_URL = _env.get(
     "ISSNET_URL", "https://www.issnetonline.com.br/goiania/online/login/login.aspx"
 )
 
@@ -61,67 +81,113 @@ CredentialData = Dict[str, Optional[str]]
 # --- Carregamento de Credenciais (Híbrido: .env + CSV) ---
 
 # 1. Carrega Credenciais Globais (Master Login) do .env
-GLOBAL_USER = os.getenv("ISSNET_USER")
-GLOBAL_PASS = os.getenv("ISSNET_PASS")
+GLOBAL_USER = _env.get("ISSNET_USER")
+GLOBAL_PASS = _env.get("ISSNET_PASS")
+
+
+# Planilha de empresas (Inscrição Municipal e CNPJ)
+COMPANIES_CSV_PATH = PROJECT_ROOT / "configuracoes.csv"
+
+# Linha interpretada do CSV: chave de busca -> (Inscrição limpa, CNPJ)
+CompanyRows = Dict[str, Tuple[str, Optional[str]]]
 
 
+def _only_digits(value: str) -> str:
+    """
+    Mantém só os dígitos, convertidos para ASCII. O NFKC traz sobrescritos e dígitos
+    de largura total colados de planilhas para "0-9"; dígitos decimais de outras
+    escritas são convertidos pelo valor, em vez de descartados (o que juntaria
+    inscrições diferentes na mesma chave).
+    """
+    value = unicodedata.normalize("NFKC", value)
+    return "".join(str(unicodedata.decimal(ch)) for ch in value if ch.isdecimal())
+
+
+def _parse_companies_csv(csv_path: Path) -> CompanyRows:
+    """Lê o configuracoes.csv (separador ';') e indexa as empresas pela Inscrição."""
+    rows: CompanyRows = {}
+    # newline="" é o modo documentado para o módulo csv; buffer de 1 MiB reduz os read()
+    with open(csv_path, mode="r", encoding="utf-8", newline="", buffering=1 << 20) as f:
+        # Assume que o CSV usa ponto e vírgula como separador.
+        # csv.reader + índices fixos: nenhum dict é montado por linha.
+        reader = csv.reader(f, delimiter=";")
+        header = next(reader, [])
+        i_insc = header.index("inscricao_municipal")
+        i_cnpj = header.index("cnpj")
+
+        for row in reader:
+            if len(row) <= i_insc:
+                continue  # Linha vazia ou truncada
+            inscricao = row[i_insc]
+            # CNPJ ausente (linha curta) ou em branco: sempre None
+            cnpj = (row[i_cnpj] or None) if len(row) > i_cnpj else None
+
+            if inscricao:
+                # Remove formatação se houver (apenas números)
+                inscricao_clean = _only_digits(inscricao)
+                rows[inscricao_clean] = (inscricao_clean, cnpj)
+
+                # Também mapeia pela inscrição original (com formatação) caso venha assim do frontend
+                if inscricao != inscricao_clean:
+                    rows[inscricao] = rows[inscricao_clean]
+    return rows
+
+
+@lru_cache(maxsize=1)
 def load_companies_from_csv() -> Dict[str, CredentialData]:
     """
     Lê o arquivo configuracoes.csv e constrói o dicionário de credenciais.
     Combina o login global (.env) com os dados específicos da empresa (CSV).
-    """
-    csv_path = PROJECT_ROOT / "configuracoes.csv"
-    credentials_map: Dict[str, CredentialData] = {}
 
-    if not csv_path.exists():
-        logger.warning(f"Arquivo {csv_path} não encontrado.")
+    O resultado é memoizado: o CSV é lido uma única vez por processo e as chaves
+    já são strings (Inscrição limpa e, se diferente, a original formatada).
+    Use `load_companies_from_csv.cache_clear()` para forçar uma releitura.
+    """
+    if not COMPANIES_CSV_PATH.exists():
+        logger.warning(f"Arquivo {COMPANIES_CSV_PATH} não encontrado.")
         return {}
 
     try:
-        with open(csv_path, mode="r", encoding="utf-8") as f:
-            # Assume que o CSV usa ponto e vírgula como separador
-            reader = csv.DictReader(f, delimiter=";")
-
-            for row in reader:
-                inscricao = row.get("inscricao_municipal")
-                cnpj = row.get("cnpj")
-
-                if inscricao:
-                    # Remove formatação se houver (apenas números)
-                    inscricao_clean = "".join(filter(str.isdigit, inscricao))
-
-                    # Popula o dicionário usando a Inscrição como chave
-                    credentials_map[inscricao_clean] = {
-                        "user": GLOBAL_USER,
-                        "pass": GLOBAL_PASS,
-                        "inscricao": inscricao_clean,
-                        "cnpj": cnpj, # Mantém formatação do CNPJ se vier do CSV ou limpa se necessário
-                    }
-
-                    # Também mapeia pela inscrição original (com formatação) caso venha assim do frontend
-                    if inscricao != inscricao_clean:
-                        credentials_map[inscricao] = credentials_map[inscricao_clean]
-
+        rows = _parse_companies_csv(COMPANIES_CSV_PATH)
     except Exception as e:
         logger.error(f"Erro ao ler configuracoes.csv: {e}")
+        return {}
 
-    return credentials_map
+    if not rows:
+        # Apenas um aviso, pois o CSV pode estar vazio inicialmente
+        logger.warning("Nenhuma empresa carregada de configuracoes.csv.")
 
+    # sys.intern: chave e campo "inscricao" passam a ser o mesmo objeto, e as buscas
+    # comparam por identidade primeiro.
+    return {
+        sys.intern(key): {
+            "user": GLOBAL_USER,
+            "pass": GLOBAL_PASS,
+            "inscricao": sys.intern(inscricao_clean),
+            "cnpj": cnpj,  # Mantém formatação do CNPJ se vier do CSV ou limpa se necessário
+        }
+        for key, (inscricao_clean, cnpj) in rows.items()
+    }
 
-# Carrega as credenciais dinamicamente
-CREDENTIALS: Dict[str, CredentialData] = load_companies_from_csv()
 
-# Garante que as chaves do dicionário final são strings (para lookup)
-FINAL_CREDENTIALS: Dict[str, CredentialData] = {
-    str(k): v for k, v in CREDENTIALS.items()
-}
+def __getattr__(name: str) -> Any:
+    """
+    Atributos preguiçosos do módulo (PEP 562): `CREDENTIALS` só lê o CSV no primeiro
+    acesso, e não no import de quem precisa apenas de seletores e timeouts.
+    """
+    if name == "CREDENTIALS":
+        return load_companies_from_csv()  # Mesmo objeto devolvido pelo cache
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # --- Configurações do Playwright ---
-RPA_MODE = os.getenv("RPA_MODE", "development")
+RPA_MODE = _env.get("RPA_MODE", "development")
 
-# Modern and realistic desktop Chrome user-agent
-USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+# Idioma anunciado ao portal (cabeçalho Accept-Language e navigator.languages)
+ACCEPT_LANGUAGE = "pt-BR,pt;q=0.9"
+
+# Script anti-detecção injetado uma vez por contexto (navigator.webdriver, languages, plugins)
+STEALTH_SCRIPT = RPA_DIR / "assets" / "stealth.js"
 
 # Anti-detection browser arguments
 BROWSER_ARGS = [
@@ -133,16 +199,20 @@ BROWSER_ARGS = [
 ]
 
 
+# Atraso injetado pelo Playwright em cada ação (ms). Útil só para acompanhar o robô
+# visualmente: em produção o padrão é 0, pois o custo cresce com o número de ações.
 PLAYWRIGHT_CONFIG: Dict[str, Any] = {
     "development": {
         "headless": False,  # Vê o navegador abrindo
-        "slow_mo": 50,
+        "slow_mo": int(_env.get("RPA_SLOW_MO", "50")),
         "devtools": False,
         "args": BROWSER_ARGS,
     },
     "production": {
-        "headless": False,  # Alterado para False para depurar desafios Cloudflare
-        "slow_mo": 0,
+        # Visível por padrão por causa dos desafios Cloudflare; com o STEALTH_SCRIPT
+        # ativo, RPA_HEADLESS=true volta ao modo sem interface (bem mais leve).
+        "headless": _env.get("RPA_HEADLESS", "false").lower() == "true",
+        "slow_mo": int(_env.get("RPA_SLOW_MO", "0")),
         "devtools": False,
         "args": BROWSER_ARGS,
     },
@@ -152,18 +222,85 @@ BROWSER_CONFIG: Dict[str, Any] = PLAYWRIGHT_CONFIG.get(
     RPA_MODE, PLAYWRIGHT_CONFIG["development"]
 )
 
+# --- Bloqueio de Recursos (apenas modo produção) ---
+# Imagens, fontes, mídia e analytics não são usados pelo robô; abortá-los encurta cada goto.
+BLOCK_RESOURCES = _env.get("RPA_BLOCK_RESOURCES", "true").lower() == "true"
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+# Só URLs que casam com este padrão passam pelo handler: o roteamento desativa o cache
+# HTTP das requisições interceptadas, então CSS/JS do portal ficam fora dele.
+BLOCKED_URL_PATTERN = re.compile(
+    r"\.(png|jpe?g|gif|bmp|ico|svg|webp|woff2?|ttf|otf|eot|mp3|mp4|webm)(\?|$)"
+    r"|google-analytics\.com|googletagmanager\.com|doubleclick\.net"
+    r"|facebook\.net|hotjar\.com",
+    re.IGNORECASE,
+)
+
+# --- Sessões Salvas ---
+# Janela em que a sessão salva de uma IM é considerada ativa no portal (login é pulado)
+SESSION_TTL_MINUTES = int(_env.get("RPA_SESSION_TTL_MINUTES", "30"))
+
+# --- Gravação de Vídeo (opt-in) ---
+# Desligada por padrão, inclusive em dev: a codificação VP8 contínua custa 5-15% de CPU
+# e grava em disco a cada ação. Pode ser ligada por tarefa (record_video=True) ou aqui.
+RECORD_VIDEO = _env.get("RPA_RECORD_VIDEO", "false").lower() == "true"
+VIDEOS_DIR = LOGS_DIR / "videos"
+# 1280x720 reduz pela metade o volume de pixels codificados em relação a 1920x1080
+VIDEO_SIZE: Dict[str, int] = {"width": 1280, "height": 720}
+# Converte o WebM gravado para MP4 (ffmpeg -crf 28) ao final da tarefa, se habilitado
+VIDEO_TRANSCODE_MP4 = _env.get("RPA_VIDEO_MP4", "false").lower() == "true"
+
+# --- Execução em Lote ---
+# Máximo de robôs simultâneos (também é o tamanho do pool de contextos do navegador)
+RPA_MAX_WORKERS = max(1, int(_env.get("RPA_MAX_WORKERS", "2")))
+
+# --- Teclado Virtual ---
+# Digita a senha inteira em um único evaluate (1 ida ao navegador em vez de ~3 por dígito).
+# Desligue (false) se o portal passar a exigir cliques confiáveis (isTrusted) no teclado.
+VIRTUAL_KEYBOARD_BATCH = _env.get("RPA_VIRTUAL_KEYBOARD_BATCH", "true").lower() == "true"
+
 # --- Timeouts (em milissegundos) ---
-DEFAULT_TIMEOUT = int(os.getenv("RPA_DEFAULT_TIMEOUT", "30000"))
-LOGIN_TIMEOUT = int(os.getenv("RPA_LOGIN_TIMEOUT", "60000"))
+DEFAULT_TIMEOUT = int(_env.get("RPA_DEFAULT_TIMEOUT", "30000"))
+LOGIN_TIMEOUT = int(_env.get("RPA_LOGIN_TIMEOUT", "60000"))
 NAVIGATION_TIMEOUT = 60000
 UPLOAD_TIMEOUT = 120000
 
+# Evento que encerra um goto. O robô só precisa do DOM: cada navegação é seguida da
+# espera pelo elemento-chave da tela, então aguardar "load" (todos os recursos) é desperdício.
+NAV_WAIT = "domcontentloaded"
+
 # --- Configuração de Polling (Consultas) ---
+# Intervalo adaptativo: começa em POLLING_INTERVAL e dobra a cada consulta sem status
+# final, até POLLING_INTERVAL_MAX. POLLING_TIMEOUT limita a espera total.
 POLLING_MAX_RETRIES = 20
-POLLING_INTERVAL = 5  # Segundos
+POLLING_INTERVAL = 2  # Segundos (primeira espera)
+POLLING_INTERVAL_MAX = 30  # Segundos
+POLLING_TIMEOUT = 300  # Segundos
 
 # --- SELETORES (Mapeamento do DOM) ---
-SELECTORS: Dict[str, Any] = {
+@dataclass(frozen=True, slots=True)
+class _ImportacaoSel:
+    """Seletores da tela de importação, acessados como atributos (e checados pelo IDE)."""
+
+    # O input para injeção de arquivo (file_uploader.py)
+    input_arquivo: str = "#txtUpload"
+    btn_importar: str = "#btnImportarArquivo"
+    # O overlay que dita o fim do processamento do servidor (sincronização crítica)
+    loading_overlay: str = "#loading"
+    chk_separador: str = "#radSeparadorPonto"
+    chk_dv: str = "#radDVSim"
+    msg_resultado: str = "#divMensagemResultado"
+    msg_erro_detalhe: str = "#lblErro"
+    btn_atualizar_status: str = "#imbLocalizar"
+    # Primeira linha de dados (a 1ª é o cabeçalho). Combinador ">" ancorado no id: só as
+    # linhas diretas da grid são candidatas, nunca linhas de tabelas aninhadas nas células.
+    grid_status_row: str = "#dgImportacao > tbody > tr:nth-child(2)"
+    # Trecho da URL do PostBack de importação (não é seletor; usado em expect_response)
+    import_post_url: str = "/ImportacaoServicosContratados.aspx"
+
+
+SELECTORS_IMPORTACAO = _ImportacaoSel()
+
+_SELECTORS: Dict[str, Any] = {
     "login": {
         "username_input": "#txtLogin",
         # O campo é readonly e a interação deve ser via teclado virtual (authentication.py)
@@ -192,28 +329,30 @@ SELECTORS: Dict[str, Any] = {
         # Validadores de carregamento
         "loading_overlay": "#divCarregando", # Padrão NotaControl, mesmo que oculto no HTML estático
     },
-    "importacao": {
-        # O input para injeção de arquivo (file_uploader.py)
-        "input_arquivo": "#txtUpload",
-        "btn_importar": "#btnImportarArquivo",
-        # O overlay que dita o fim do processamento do servidor (sincronização crítica)
-        "loading_overlay": "#loading",
-        "chk_separador": "#radSeparadorPonto",
-        "chk_dv": "#radDVSim",
-        "msg_resultado": "#divMensagemResultado",
-        "msg_erro_detalhe": "#lblErro",
-        "btn_atualizar_status": "#imbLocalizar",
-        "grid_status_row": "#dgImportacao tr:nth-child(2)",
-    },
+    # Fonte única: SELECTORS_IMPORTACAO (acima); aqui só a visão em dicionário
+    "importacao": asdict(SELECTORS_IMPORTACAO),
     "consulta": {
         "competencia_mes": "#ddlMes",
         "competencia_ano": "#txtAno",
         "btn_localizar": "#btnLocalizar",
         "grid_resultados": "#dgSolicitacoes",
         "loading_overlay": "#loading",
+        # Trecho da URL do PostBack disparado por "Localizar" (recarrega a grid)
+        "grid_refresh_url": "ConsultaImportacaoServicosContratados.aspx",
     },
 }
 
+
+def _freeze(mapping: Dict[str, Any]) -> Mapping[str, Any]:
+    """Converte o dicionário (e os aninhados) em visões somente leitura."""
+    return MappingProxyType(
+        {key: _freeze(value) if isinstance(value, dict) else value for key, value in mapping.items()}
+    )
+
+
+# Somente leitura: compartilhado entre threads/robôs, nenhum módulo pode alterá-lo
+SELECTORS: Mapping[str, Any] = _freeze(_SELECTORS)
+
 # ----------------------------------------------------------------------
 # FUNÇÕES AUXILIARES (Requeridas pelo rpa/__init__.py para expor a lógica)
 # ----------------------------------------------------------------------
@@ -247,7 +386,7 @@ def get_credentials_by_inscricao(inscricao: str) -> Optional[CredentialData]:
     Retorno: Um dicionário com 'user', 'pass' e 'inscricao', ou None se a inscrição não for encontrada.
     """
     # Usamos .get() que retorna None se a chave não existir, o que é mapeado pela tipagem Optional.
-    return FINAL_CREDENTIALS.get(inscricao)
+    return load_companies_from_csv().get(str(inscricao))
 
 
 # --- Validação Básica ---
@@ -260,11 +399,6 @@ def validate_config():
     if not GLOBAL_USER or not GLOBAL_PASS:
         errors.append("ISSNET_USER ou ISSNET_PASS não definidos no .env.")
 
-    # Usamos FINAL_CREDENTIALS para garantir que a checagem é feita após a filtragem de chaves None
-    if not FINAL_CREDENTIALS:
-        # Apenas um aviso, pois o CSV pode estar vazio inicialmente
-        logger.warning("Nenhuma empresa carregada de configuracoes.csv.")
-
     if errors:
         # A impressão de aviso é mantida para visibilidade no console
         logger.warning(f"Aviso de Configuração RPA: {', '.join(errors)}")
@@ -8,35 +8,60 @@ Responsabilidade:
 3. Gerenciar as configurações de importação (checkboxes).
 4. Clicar no botão de importação e aguardar a conclusão do processamento.
 """
+import asyncio
 from pathlib import Path
-from playwright.sync_api import Page, TimeoutError as PlaywrightTimeout
+from types import SimpleNamespace
+from typing import Optional
+
+from playwright.async_api import Page
 
 # Módulos de configuração e utilitários
-from rpa.config_rpa import SELECTORS, UPLOAD_TIMEOUT
+from rpa.config_rpa import SELECTORS_IMPORTACAO, UPLOAD_TIMEOUT
 from rpa.error_handler import ProcessingError
-from rpa.utils import setup_logger, validate_file_exists
+from rpa.locators import build_locators
+from rpa.utils import setup_logger, validate_file_with_size
 
 # Configuração do Logger para este módulo
 logger = setup_logger("rpa_file_uploader")
 
+# Trecho da URL do PostBack de importação (resolvido uma vez, não a cada upload)
+_IMPORT_POST_URL = SELECTORS_IMPORTACAO.import_post_url
+_CHK_SEPARADOR = SELECTORS_IMPORTACAO.chk_separador
+
+# Arquivos até este tamanho vão em memória para o input (sem o Chromium reabrir do disco)
+_UPLOAD_BUFFER_LIMIT = 4 << 20  # 4 MiB
+
+# Marca a opção, se visível e ainda desmarcada, em uma única ida ao navegador.
+# Retorna true se o elemento existe na página.
+_MARCAR_OPCAO_JS = """
+(sel) => {
+    const el = document.querySelector(sel);
+    if (!el) return false;
+    if (el.offsetParent !== null && !el.checked) el.click();
+    return true;
+}
+"""
+
 
 class ISSUploader:
     """
     Encapsula a lógica de upload do arquivo de declaração no portal.
     """
 
-    def __init__(self, page: Page, task_id: str):
+    def __init__(self, page: Page, task_id: str, locs: Optional[SimpleNamespace] = None):
         """
         Inicializa o uploader.
 
         Args:
             page (Page): Objeto Page do Playwright.
             task_id (str): ID da tarefa para rastreamento nos logs.
+            locs (SimpleNamespace, optional): Locators pré-construídos (rpa.locators).
         """
         self.page = page
         self.task_id = task_id
+        self.locs = locs or build_locators(page)
 
-    def upload_file(self, file_path: str) -> None:
+    async def upload_file(self, file_path: str) -> None:
         """
         Realiza o upload do arquivo TXT, tratando interações e esperas.
 
@@ -47,67 +72,76 @@ class ISSUploader:
             ProcessingError: Se o arquivo for inválido ou se ocorrer um erro durante o upload.
         """
         logger.info(
-            f"[{self.task_id}] 📤 Iniciando processo de upload do arquivo: {Path(file_path).name}"
+            "[%s] 📤 Iniciando processo de upload do arquivo: %s", self.task_id, Path(file_path).name
         )
 
         # --- Validação Preliminar do Arquivo ---
-        is_valid, error_msg = validate_file_exists(file_path)
+        # O tamanho vem do mesmo os.stat da validação (decide buffer x caminho abaixo)
+        is_valid, error_msg, file_size = validate_file_with_size(file_path)
         if not is_valid:
-            logger.error(f"[{self.task_id}] Validação falhou: {error_msg}")
+            logger.error("[%s] Validação falhou: %s", self.task_id, error_msg)
             raise ProcessingError(f"Arquivo inválido para upload: {error_msg}")
 
         try:
-            sels = SELECTORS["importacao"]
+            locs = self.locs.importacao
 
             # 1. Configuração de Opções (Checkbox Separador)
             logger.debug(
-                f"[{self.task_id}] Verificando e marcando o checkbox 'Separador Ponto e Vírgula'."
+                "[%s] Verificando e marcando o checkbox 'Separador Ponto e Vírgula'.", self.task_id
             )
-            chk_separador_locator = self.page.locator(sels["chk_separador"])
-            if chk_separador_locator.is_visible():
-                chk_separador_locator.check()
-                logger.debug(
-                    f"[{self.task_id}] Checkbox 'Separador Ponto e Vírgula' marcado."
-                )
+            try:
+                await self.page.evaluate(_MARCAR_OPCAO_JS, _CHK_SEPARADOR)
+            except Exception as e_eval:
+                # Fallback: caminho via Locator (duas idas ao navegador)
+                logger.debug("[%s] Evaluate do checkbox falhou (%s); usando Locator.", self.task_id, e_eval)
+                chk_separador_locator = locs.chk_separador
+                if await chk_separador_locator.is_visible():
+                    await chk_separador_locator.check()
+            logger.debug("[%s] Checkbox 'Separador Ponto e Vírgula' verificado.", self.task_id)
 
             # 2. Injeção do Arquivo
-            logger.debug(f"[{self.task_id}] Injetando o arquivo no input oculto.")
-            self.page.set_input_files(sels["input_arquivo"], str(file_path))
+            logger.debug("[%s] Injetando o arquivo no input oculto.", self.task_id)
+            path = Path(file_path)
+            if file_size < _UPLOAD_BUFFER_LIMIT:
+                # Leitura em thread: o event loop do Playwright é compartilhado por todas as tarefas
+                buffer = await asyncio.to_thread(path.read_bytes)
+                await locs.input_arquivo.set_input_files(
+                    files=[{"name": path.name, "mimeType": "text/plain", "buffer": buffer}]
+                )
+            else:
+                await locs.input_arquivo.set_input_files(path)
 
             # 3. Disparo do Envio
-            logger.info(
-                f"[{self.task_id}] Clicando no botão 'Importar' para iniciar o processamento."
-            )
-            self.page.click(sels["btn_importar"])
+            # Bloqueia exatamente até a resposta do PostBack de importação chegar,
+            # sem depender de o overlay de "Aguarde" chegar a ser renderizado.
+            def _is_import_response(response) -> bool:
+                return _IMPORT_POST_URL in response.url and response.request.method == "POST"
 
-            # 4. Sincronização de Carregamento (Crítico)
-            loading_sel = sels["loading_overlay"]
-            logger.debug(
-                f"[{self.task_id}] Aguardando o início do processamento (overlay de loading)."
+            logger.info(
+                "[%s] Clicando no botão 'Importar' para iniciar o processamento.", self.task_id
             )
-            try:
-                # Espera o overlay de "Aguarde" aparecer.
-                self.page.wait_for_selector(loading_sel, state="visible", timeout=5000)
-                logger.debug(
-                    f"[{self.task_id}] Overlay de carregamento detectado. Aguardando desaparecimento."
-                )
-            except PlaywrightTimeout:
-                # Se o overlay não aparecer, pode ser que o processo tenha sido instantâneo.
-                logger.warning(
-                    f"[{self.task_id}] Overlay de loading não foi detectado (pode ter sido muito rápido)."
+            async with self.page.expect_response(
+                _is_import_response, timeout=UPLOAD_TIMEOUT
+            ) as response_info:
+                await locs.btn_importar.click()
+
+            response = await response_info.value
+            if not response.ok:
+                raise ProcessingError(
+                    f"Portal respondeu HTTP {response.status} à importação."
                 )
 
-            # Espera o overlay de "Aguarde" desaparecer, indicando o fim do processamento.
-            self.page.wait_for_selector(
-                loading_sel, state="detached", timeout=UPLOAD_TIMEOUT
-            )
+            # 4. Sincronização de Carregamento (Crítico)
+            # O overlay de "Aguarde" some logo após a resposta; garante a tela redesenhada.
+            logger.debug("[%s] Resposta da importação recebida. Aguardando overlay.", self.task_id)
+            await locs.loading_overlay.wait_for(state="detached", timeout=UPLOAD_TIMEOUT)
             logger.info(
-                f"[{self.task_id}] ✅ Processamento do arquivo no servidor finalizado com sucesso."
+                "[%s] ✅ Processamento do arquivo no servidor finalizado com sucesso.", self.task_id
             )
 
         except Exception as e:
             logger.error(
-                f"[{self.task_id}] ❌ Erro crítico durante o processo de upload: {str(e)}"
+                "[%s] ❌ Erro crítico durante o processo de upload: %s", self.task_id, e
             )
             raise ProcessingError(
                 f"Falha na etapa de upload do arquivo. O portal pode ter apresentado instabilidade."
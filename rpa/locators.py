@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Módulo de Locators (rpa/locators.py).
+
+Responsabilidade:
+1. Converter o mapa estático SELECTORS em objetos Locator do Playwright, uma vez por página.
+2. Compartilhar esses Locators entre autenticador, navegador, uploader e parser.
+"""
+from types import SimpleNamespace
+from typing import Any, Mapping
+
+from playwright.async_api import Page
+
+from rpa.config_rpa import SELECTORS
+
+# Entradas de SELECTORS que não são seletores CSS (ex: trechos de URL)
+_NON_SELECTOR_KEYS = frozenset({"grid_refresh_url", "import_post_url"})
+
+
+def _build(page: Page, mapping: Mapping[str, Any]) -> SimpleNamespace:
+    bundle = SimpleNamespace()
+    for key, value in mapping.items():
+        if key in _NON_SELECTOR_KEYS:
+            continue
+        if isinstance(value, Mapping):
+            setattr(bundle, key, _build(page, value))
+        else:
+            setattr(bundle, key, page.locator(value))
+    return bundle
+
+
+def build_locators(page: Page) -> SimpleNamespace:
+    """
+    Cria os Locators de todas as seções de SELECTORS para a página informada.
+
+    A estrutura espelha o dicionário: `locs.login.submit_button`,
+    `locs.login.virtual_keyboard.btn1`, `locs.importacao.btn_importar`, etc.
+    """
+    return _build(page, SELECTORS)
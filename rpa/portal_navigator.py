@@ -7,17 +7,84 @@ Responsabilidade:
 2. Selecionar a empresa correta (Contribuinte) no grid dinâmico após o login.
 3. Fornecer feedback de progresso claro durante a navegação.
 """
-import time
-from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
+from types import SimpleNamespace
+from typing import Optional
+
+from playwright.async_api import Error as PlaywrightError, Page, TimeoutError as PlaywrightTimeoutError
 
 # Módulos de configuração e utilitários
-from rpa.config_rpa import SELECTORS, DEFAULT_TIMEOUT, NAVIGATION_TIMEOUT, URLS
+from rpa.config_rpa import SELECTORS, DEFAULT_TIMEOUT, NAV_WAIT, NAVIGATION_TIMEOUT, URLS
 from rpa.error_handler import NavigationError
+from rpa.locators import build_locators
 from rpa.utils import setup_logger
 
 # Configuração do Logger para este módulo
 logger = setup_logger("rpa_portal_navigator")
 
+# Trecho da URL do PostBack de "Localizar" (resolvido uma vez, não a cada polling)
+_GRID_REFRESH_URL = SELECTORS["consulta"]["grid_refresh_url"]
+# URLs fixas das telas (também usadas nas mensagens de erro)
+_IMPORTACAO_URL = URLS["importacao"]
+_CONSULTA_URL = URLS["consulta_importacao"]
+_DDL_COMPETENCIA = (
+    SELECTORS["selecao_empresa"]["ddl_mes"],
+    SELECTORS["selecao_empresa"]["ddl_ano"],
+)
+
+# Ajusta Mês e Ano em uma única ida ao navegador. Dropdowns comuns recebem o
+# "change" na hora; dos AutoPostBack só o último é devolvido (índice) para o Python
+# disparar e aguardar, pois um único PostBack já envia os dois valores.
+# Retorna null se algum select ou opção não existir (fallback: select_option).
+_COMPETENCIA_JS = """
+(pairs) => {
+    const isPostBack = (el) => /__doPostBack/.test(el.getAttribute('onchange') || '');
+    const els = [];
+    for (const [sel, value] of pairs) {
+        const el = document.querySelector(sel);
+        if (!el || !Array.from(el.options).some(o => o.value === value)) return null;
+        els.push(el);
+    }
+    let postback = -1;
+    els.forEach((el, i) => {
+        el.value = pairs[i][1];
+        if (isPostBack(el)) postback = i;
+        else el.dispatchEvent(new Event('change', { bubbles: true }));
+    });
+    return postback;
+}
+"""
+
+# Marcadores da página de desafio do Cloudflare (URL já está em cache no Python;
+# a contagem no DOM é uma única ida ao navegador, sem buscar o título)
+_CF_URL_MARKERS = ("/cdn-cgi/challenge-platform", "__cf_chl")
+_CF_CHALLENGE = "#challenge-running, #cf-challenge-running, #challenge-stage"
+
+_FILTROS_EMPRESA = (
+    SELECTORS["selecao_empresa"]["input_inscricao"],
+    SELECTORS["selecao_empresa"]["input_filtro_cnpj"],
+)
+
+# Preenche Inscrição e CNPJ em uma única ida ao navegador, disparando os eventos que o
+# portal escuta (input/change/blur). Retorna false se já estavam preenchidos, true se
+# foram preenchidos, e null se um campo não existir ou recusar o valor (ex: máscara).
+_FILTROS_JS = """
+([sels, values]) => {
+    const els = sels.map((sel) => document.querySelector(sel));
+    if (els.some((el) => !el)) return null;
+    if (els.every((el, i) => el.value === values[i])) return false;
+    const fire = (el) => ['input', 'change', 'blur'].forEach(
+        (type) => el.dispatchEvent(new Event(type, { bubbles: true }))
+    );
+    els.forEach((el, i) => { el.value = values[i]; fire(el); });
+    return els.every((el, i) => el.value === values[i]) ? true : null;
+}
+"""
+
+
+def _is_postback(response) -> bool:
+    """Resposta de um PostBack ASP.NET (POST para uma página .aspx)."""
+    return response.request.method == "POST" and ".aspx" in response.url
+
 
 class ISSNavigator:
     """
@@ -25,18 +92,20 @@ class ISSNavigator:
     contribuintes e o acesso a páginas específicas.
     """
 
-    def __init__(self, page: Page, task_id: str):
+    def __init__(self, page: Page, task_id: str, locs: Optional[SimpleNamespace] = None):
         """
         Inicializa o navegador do portal.
 
         Args:
             page (Page): Objeto Page do Playwright.
             task_id (str): ID da tarefa para rastreamento nos logs.
+            locs (SimpleNamespace, optional): Locators pré-construídos (rpa.locators).
         """
         self.page = page
         self.task_id = task_id
+        self.locs = locs or build_locators(page)
 
-    def select_contribuinte(self, inscricao: str, cnpj: str, mes: str, ano: str):
+    async def select_contribuinte(self, inscricao: str, cnpj: str, mes: str, ano: str):
         """
         Preenche a Inscrição Municipal, CNPJ e Competência (Mês/Ano), localiza a empresa
         e lida com o desafio Cloudflare que pode ocorrer após a busca.
@@ -50,92 +119,132 @@ class ISSNavigator:
         Raises:
             NavigationError: Se a empresa não for encontrada ou se ocorrer um erro de navegação.
         """
-        logger.info(f"[{self.task_id}] 🏢 Iniciando seleção: IM='{inscricao}', CNPJ='{cnpj}', Comp='{mes}/{ano}'.")
+        logger.info("[%s] 🏢 Iniciando seleção: IM='%s', CNPJ='%s', Comp='%s/%s'.", self.task_id, inscricao, cnpj, mes, ano)
 
         try:
             # 1. Aguarda e preenche os campos de filtro
-            inscricao_selector = SELECTORS["selecao_empresa"]["input_inscricao"]
-            cnpj_selector = SELECTORS["selecao_empresa"]["input_filtro_cnpj"]
-            mes_selector = SELECTORS["selecao_empresa"]["ddl_mes"]
-            ano_selector = SELECTORS["selecao_empresa"]["ddl_ano"]
-
-            self.page.wait_for_selector(inscricao_selector, state="visible", timeout=15000)
-            logger.debug(f"[{self.task_id}] Formulário de seleção visível. Preenchendo dados...")
-
-            # Simula comportamento humano para acionar eventos JS
-            self.page.click(inscricao_selector)
-            self.page.fill(inscricao_selector, inscricao)
-
-            self.page.click(cnpj_selector)
-            self.page.fill(cnpj_selector, cnpj)
-            self.page.press(cnpj_selector, "Tab")  # Dispara on-blur
+            locs = self.locs.selecao_empresa
+            inscricao_input = locs.input_inscricao
+            cnpj_input = locs.input_filtro_cnpj
+
+            # Um único evaluate preenche os dois filtros. Reseleção (retry na mesma
+            # página) com os filtros já preenchidos vai direto à busca.
+            # Sem wait_for à parte: o script não espera, mas devolve null se o formulário
+            # ainda não estiver na página, e o fallback (fill com auto-wait) o aguarda.
+            try:
+                preenchido = await self.page.evaluate(
+                    _FILTROS_JS, [_FILTROS_EMPRESA, [inscricao, cnpj]]
+                )
+            except PlaywrightError as e:
+                logger.debug("[%s] Preenchimento via script falhou: %s", self.task_id, e)
+                preenchido = None
+
+            if preenchido is False:
+                logger.debug("[%s] Filtros já preenchidos com a empresa alvo.", self.task_id)
+            elif preenchido is None:
+                # Fallback: fill() espera o campo (auto-wait), foca e dispara "input";
+                # os eventos que o portal escuta (change/blur) são disparados explicitamente.
+                logger.debug("[%s] Preenchendo filtros campo a campo...", self.task_id)
+                await inscricao_input.fill(inscricao, timeout=15000)
+
+                await cnpj_input.fill(cnpj)
+                await cnpj_input.dispatch_event("change")
+                await cnpj_input.dispatch_event("blur")  # Dispara on-blur
 
             # Seleciona Mês e Ano (Requisito Crítico 1: Contexto de Competência)
             if mes and ano:
-                logger.debug(f"[{self.task_id}] Selecionando competência: {mes}/{ano}")
-                self.page.select_option(mes_selector, str(mes))
-                self.page.select_option(ano_selector, str(ano))
-                # Aguarda brevemente para processamento de eventos do dropdown
-                time.sleep(0.5)
+                logger.debug("[%s] Selecionando competência: %s/%s", self.task_id, mes, ano)
+                await self._select_competencia(str(mes), str(ano))
 
             # 2. Executa a busca
-            logger.debug(f"[{self.task_id}] Filtros preenchidos. Clicando em 'Localizar'...")
-            self.page.click(SELECTORS["selecao_empresa"]["btn_localizar"])
+            logger.debug("[%s] Filtros preenchidos. Clicando em 'Localizar'...", self.task_id)
 
             # Requisito Crítico 3: ASP.NET PostBack Synchronization
-            # Aguarda o overlay de carregamento aparecer e sumir para garantir sincronia
-            loading_sel = SELECTORS["selecao_empresa"]["loading_overlay"]
+            # Bloqueia só até a resposta do PostBack chegar e o overlay sumir: nenhuma
+            # espera fixa (overlay visível, networkidle ou sleep) além do tempo real do servidor.
             try:
-                self.page.wait_for_selector(loading_sel, state="visible", timeout=5000)
-                self.page.wait_for_selector(loading_sel, state="hidden", timeout=15000)
+                async with self.page.expect_response(_is_postback, timeout=15000):
+                    await locs.btn_localizar.click()
+                await locs.loading_overlay.wait_for(state="hidden", timeout=15000)
             except PlaywrightTimeoutError:
-                # Se o overlay não aparecer ou não sumir, logamos mas tentamos seguir
-                logger.warning(f"[{self.task_id}] Overlay de loading não detectado ou demorou a sumir.")
-
-            # Aguarda o recarregamento da página ou a resposta do servidor
-            try:
-                # Espera pelo evento de carga de rede (networkidle) que indica fim do PostBack
-                self.page.wait_for_load_state("networkidle", timeout=10000)
-            except Exception:
-                # Fallback: sleep fixo se networkidle falhar (comum em ASP.NET com AJAX parcial)
-                logger.warning(f"[{self.task_id}] NetworkIdle timeout no PostBack. Usando wait fixo.")
-                time.sleep(3)
+                # Sem resposta ou overlay preso: a validação abaixo decide se houve falha
+                logger.warning("[%s] PostBack de 'Localizar' não confirmado a tempo.", self.task_id)
 
             # 3. Validação de Sucesso com Tratamento de Cloudflare
-            logger.debug(f"[{self.task_id}] Validando entrada no painel da empresa...")
+            logger.debug("[%s] Validando entrada no painel da empresa...", self.task_id)
             try:
                 # A melhor validação é esperar o elemento do filtro desaparecer.
-                self.page.wait_for_selector(
-                    inscricao_selector, state="hidden", timeout=15000
-                )
+                await inscricao_input.wait_for(state="hidden", timeout=15000)
             except PlaywrightTimeoutError:
                 # Se o seletor não desaparecer, verifica se é por causa do Cloudflare
-                page_title = self.page.title().lower()
-                if "just a moment" in page_title or "challenge" in page_title:
+                if await self._em_desafio_cloudflare():
                     logger.warning(
-                        f"[{self.task_id}] ⚠️ Desafio Cloudflare detectado após a seleção de empresa. Aguardando resolução..."
+                        "[%s] ⚠️ Desafio Cloudflare detectado após a seleção de empresa. Aguardando resolução...", self.task_id
                     )
                     # Aumenta o timeout para dar tempo ao Stealth de resolver
-                    self.page.wait_for_selector(
-                        inscricao_selector, state="hidden", timeout=120000
-                    )
-                    logger.info(f"[{self.task_id}] Desafio Cloudflare resolvido. Acesso ao painel liberado.")
+                    await inscricao_input.wait_for(state="hidden", timeout=120000)
+                    logger.info("[%s] Desafio Cloudflare resolvido. Acesso ao painel liberado.", self.task_id)
                 else:
-                    # Se não for Cloudflare, é um erro de navegação
+                    # Se não for Cloudflare, é um erro de navegação (título só para diagnóstico)
+                    try:
+                        page_title = await self.page.title()
+                    except PlaywrightError:
+                        page_title = "?"
                     raise NavigationError(
-                        f"Timeout ao entrar no painel da empresa para o CNPJ {cnpj}. O portal pode estar lento ou a empresa não foi encontrada."
+                        f"Timeout ao entrar no painel da empresa para o CNPJ {cnpj}. O portal pode estar lento ou a empresa não foi encontrada. (página: '{page_title}')"
                     )
 
-            logger.info(f"[{self.task_id}] ✅ Acesso ao painel da empresa com CNPJ {cnpj} bem-sucedido!")
+            logger.info("[%s] ✅ Acesso ao painel da empresa com CNPJ %s bem-sucedido!", self.task_id, cnpj)
 
-        except Exception as e:
-            logger.error(f"[{self.task_id}] ❌ Falha crítica na seleção de empresa: {str(e)}")
-            # Encapsula a exceção original
+        except NavigationError as e:
+            logger.error("[%s] ❌ Falha crítica na seleção de empresa: %s", self.task_id, e)
+            raise
+        except PlaywrightTimeoutError as e:
+            # Só timeouts viram NavigationError; outros erros (página fechada, seletor
+            # inválido) sobem sem encapsulamento e aparecem com a causa real.
+            logger.error("[%s] ❌ Falha crítica na seleção de empresa: %s", self.task_id, e)
             raise NavigationError(
                 f"Não foi possível selecionar a empresa com CNPJ {cnpj}. Verifique se os dados estão corretos."
             ) from e
 
-    def navigate_to_import_page(self) -> None:
+    async def _em_desafio_cloudflare(self) -> bool:
+        """
+        Indica se a página atual é o desafio do Cloudflare, pela URL ou pelos elementos do desafio.
+        """
+        if any(marker in self.page.url for marker in _CF_URL_MARKERS):
+            return True
+        return await self.page.locator(_CF_CHALLENGE).count() > 0
+
+    async def _select_competencia(self, mes: str, ano: str) -> None:
+        """
+        Seleciona Mês e Ano com no máximo um PostBack (em vez de um por dropdown).
+        """
+        locs = self.locs.selecao_empresa
+        postback = await self.page.evaluate(
+            _COMPETENCIA_JS, [[_DDL_COMPETENCIA[0], mes], [_DDL_COMPETENCIA[1], ano]]
+        )
+        if postback is None:
+            # Select ainda não renderizado ou opção ausente: select_option espera/valida
+            await self._select_option(locs.ddl_mes, mes)
+            await self._select_option(locs.ddl_ano, ano)
+        elif postback >= 0:
+            async with self.page.expect_response(_is_postback, timeout=DEFAULT_TIMEOUT):
+                await (locs.ddl_mes, locs.ddl_ano)[postback].dispatch_event("change")
+
+    async def _select_option(self, dropdown, value: str) -> None:
+        """
+        Seleciona a opção e, se o dropdown for AutoPostBack, aguarda a resposta do
+        PostBack disparado pelo onchange (em vez de uma pausa fixa ou networkidle).
+        """
+        onchange = await dropdown.get_attribute("onchange") or ""
+        if "__doPostBack" not in onchange:
+            await dropdown.select_option(value)
+            return
+
+        async with self.page.expect_response(_is_postback, timeout=DEFAULT_TIMEOUT):
+            await dropdown.select_option(value)
+
+    async def navigate_to_import_page(self) -> None:
         """
         Navega diretamente para a página de importação de serviços contratados.
         Utiliza a URL base atual para evitar perda de sessão em caso de troca de domínio (Deep Linking seguro).
@@ -150,93 +259,86 @@ class ISSNavigator:
                 target_url = f"{base_url}Servicos_Contratados/ImportacaoServicosContratados.aspx"
             else:
                 # Fallback para a URL estática configurada
-                target_url = URLS["importacao"]
+                target_url = _IMPORTACAO_URL
 
             logger.info(
-                f"[{self.task_id}] 🧭 Navegando para a tela de Importação: {target_url}"
+                "[%s] 🧭 Navegando para a tela de Importação: %s", self.task_id, target_url
             )
 
-            self.page.goto(target_url, timeout=NAVIGATION_TIMEOUT)
+            await self.page.goto(target_url, wait_until=NAV_WAIT, timeout=NAVIGATION_TIMEOUT)
             # Confirma que a página carregou verificando um elemento chave
-            self.page.wait_for_selector(
-                SELECTORS["importacao"]["input_arquivo"],
-                state="visible",
-                timeout=DEFAULT_TIMEOUT,
+            await self.locs.importacao.input_arquivo.wait_for(
+                state="visible", timeout=DEFAULT_TIMEOUT
             )
             logger.info(
-                f"[{self.task_id}] ✅ Navegação para a página de Importação concluída com sucesso."
+                "[%s] ✅ Navegação para a página de Importação concluída com sucesso.", self.task_id
             )
         except Exception as e:
             logger.error(
-                f"[{self.task_id}] ❌ Falha ao navegar para a página de Importação: {str(e)}"
+                "[%s] ❌ Falha ao navegar para a página de Importação: %s", self.task_id, e
             )
             raise NavigationError(
-                f"Erro ao tentar acessar a URL de Importação: {URLS['importacao']}. O portal pode estar instável."
+                f"Erro ao tentar acessar a URL de Importação: {_IMPORTACAO_URL}. O portal pode estar instável."
             ) from e
 
-    def ir_para_consulta(self) -> None:
+    async def ir_para_consulta(self) -> None:
         """
         Navega para a página de Consulta de Importações (status pós-upload).
         """
         logger.info(
-            f"[{self.task_id}] 🧭 Navegando para a tela de Consulta de Importações..."
+            "[%s] 🧭 Navegando para a tela de Consulta de Importações...", self.task_id
         )
         try:
             # Navega para a URL definida nas configurações
-            self.page.goto(URLS["consulta_importacao"], timeout=NAVIGATION_TIMEOUT)
+            await self.page.goto(
+                _CONSULTA_URL, wait_until=NAV_WAIT, timeout=NAVIGATION_TIMEOUT
+            )
 
             # Aguarda o carregamento do botão de localizar para confirmar sucesso
-            self.page.wait_for_selector(
-                SELECTORS["consulta"]["btn_localizar"],
-                state="visible",
-                timeout=DEFAULT_TIMEOUT,
+            await self.locs.consulta.btn_localizar.wait_for(
+                state="visible", timeout=DEFAULT_TIMEOUT
             )
             logger.info(
-                f"[{self.task_id}] ✅ Navegação para Consulta concluída."
+                "[%s] ✅ Navegação para Consulta concluída.", self.task_id
             )
         except Exception as e:
             logger.error(
-                f"[{self.task_id}] ❌ Falha ao navegar para Consulta: {str(e)}"
+                "[%s] ❌ Falha ao navegar para Consulta: %s", self.task_id, e
             )
             raise NavigationError(
                 f"Erro ao acessar tela de Consulta. Portal offline?"
             ) from e
 
-    def atualizar_grid(self) -> None:
+    async def atualizar_grid(self) -> None:
         """
         Realiza a ação de atualizar a grid de resultados na tela de Consulta.
-        Fluxo: Espera 15s -> Clica em Localizar -> Espera Overlay aparecer e sumir.
+        Fluxo: Clica em Localizar -> Aguarda a resposta do PostBack -> Espera Overlay sumir.
+
+        O intervalo entre consultas é controlado pelo loop de polling (POLLING_INTERVAL);
+        aqui esperamos apenas o tempo real da resposta do servidor.
         """
-        logger.info(f"[{self.task_id}] 🔄 Iniciando atualização da grid de status...")
+        logger.info("[%s] 🔄 Iniciando atualização da grid de status...", self.task_id)
 
         try:
-            # Requisito do usuário: Aguardar 15 segundos antes de clicar
-            # Isso dá tempo para o backend da prefeitura processar o arquivo recém-enviado
-            logger.debug(f"[{self.task_id}] Aguardando 15s antes de clicar em Localizar...")
-            time.sleep(15)
-
-            sels = SELECTORS["consulta"]
-
-            # Clica no botão de localizar (PostBack)
-            logger.debug(f"[{self.task_id}] Clicando em 'Localizar'...")
-            self.page.click(sels["btn_localizar"])
-
-            # Sincronização com o Loading Overlay
-            # O sistema exibe um 'Aguarde' via JS. Precisamos esperar ele aparecer e sumir.
-            loading_sel = sels["loading_overlay"]
+            def _is_grid_refresh(response) -> bool:
+                return (
+                    _GRID_REFRESH_URL in response.url
+                    and response.request.method == "POST"
+                    and response.status == 200
+                )
 
-            try:
-                # Espera overlay aparecer (pode ser rápido)
-                self.page.wait_for_selector(loading_sel, state="visible", timeout=5000)
-            except PlaywrightTimeoutError:
-                # Se não aparecer, logamos warning, mas prosseguimos (pode ter sido instantâneo)
-                logger.warning(f"[{self.task_id}] Overlay de loading não detectado (muito rápido?).")
+            # Clica no botão de localizar (PostBack) e bloqueia só até a resposta chegar
+            logger.debug("[%s] Clicando em 'Localizar'...", self.task_id)
+            async with self.page.expect_response(_is_grid_refresh, timeout=DEFAULT_TIMEOUT):
+                await self.locs.consulta.btn_localizar.click()
 
-            # Espera overlay sumir (indica fim do PostBack/AJAX)
-            self.page.wait_for_selector(loading_sel, state="detached", timeout=DEFAULT_TIMEOUT)
+            # O 'Aguarde' (overlay JS) some logo após o PostBack; garante que a grid já foi redesenhada.
+            await self.locs.consulta.loading_overlay.wait_for(
+                state="detached", timeout=DEFAULT_TIMEOUT
+            )
 
-            logger.debug(f"[{self.task_id}] Grid atualizada (Overlay desapareceu).")
+            logger.debug("[%s] Grid atualizada (PostBack concluído).", self.task_id)
 
         except Exception as e:
-            logger.error(f"[{self.task_id}] Falha ao atualizar grid: {e}")
+            logger.error("[%s] Falha ao atualizar grid: %s", self.task_id, e)
             raise NavigationError("Erro ao tentar atualizar a grid de status.") from e
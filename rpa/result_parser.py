@@ -7,28 +7,86 @@ Responsabilidade:
 2. Classificar o resultado em Sucesso ou Erro.
 3. Estruturar o retorno de dados para o backend.
 """
+import re
+from types import SimpleNamespace
+from typing import Optional
 
-from playwright.sync_api import Page
+from playwright.async_api import Page
 from rpa.config_rpa import SELECTORS
+from rpa.locators import build_locators
 from rpa.utils import setup_logger
 
 logger = setup_logger()
 
+# Seletor da grid de Consulta usado no evaluate do fingerprint (resolvido uma vez)
+_GRID_CONSULTA = SELECTORS["consulta"]["grid_resultados"]
+
+# Texto da primeira linha da grid que contém o nome do arquivo ('' se não houver),
+# em uma única ida ao navegador em vez de count() + inner_text() por linha.
+_LINHA_ARQUIVO_JS = """([gridSel, nome]) => {
+    const rows = document.querySelectorAll(gridSel + ' tr');
+    for (const row of rows) {
+        if (row.textContent.includes(nome)) return row.textContent;
+    }
+    return '';
+}"""
+
+# Lê, em uma única ida ao navegador, o texto de cada seletor visível (null se ausente
+# ou oculto; mesmo critério do is_visible: caixa não vazia e sem visibility:hidden).
+# textContent basta para classificar; innerText (que força layout) só onde o texto
+# renderizado é exibido ao usuário como está.
+_TEXTOS_VISIVEIS_JS = """(pairs) => pairs.map(([sel, renderizado]) => {
+    const el = document.querySelector(sel);
+    if (!el || getComputedStyle(el).visibility === 'hidden') return null;
+    const box = el.getBoundingClientRect();
+    if (box.width === 0 && box.height === 0) return null;
+    return renderizado ? el.innerText : el.textContent;
+})"""
+_SELS_RESULTADO = [
+    [SELECTORS["importacao"]["grid_status_row"], False],
+    [SELECTORS["importacao"]["msg_resultado"], False],
+    [SELECTORS["importacao"]["msg_erro_detalhe"], True],
+]
+
+
+# Palavras-chave de status: uma única varredura da linha, sem cópia em minúsculas
+_STATUS_RE = re.compile(r"sucesso|êxito|erro|aguardando|processando", re.IGNORECASE)
+# Palavra-chave -> (prioridade, status). Se a linha tiver mais de uma, vence a de menor
+# prioridade: sucesso antes de erro, erro antes de aguardando.
+_STATUS_MAP = {
+    "sucesso": (0, "Processado com Sucesso"),
+    "êxito": (0, "Processado com Sucesso"),
+    "erro": (1, "Processado com Erro"),
+    "aguardando": (2, "Aguardando"),
+    "processando": (2, "Aguardando"),
+}
+
+
+def classificar_linha(texto_linha: str) -> str:
+    """
+    Classifica o texto de uma linha da grid de Consulta no status conhecido.
+    Função pura (sem acesso ao navegador), reaproveitada pelo polling.
+    """
+    encontrados = _STATUS_RE.findall(texto_linha)
+    if not encontrados:
+        return f"Status Desconhecido: {texto_linha}"
+    return min(_STATUS_MAP[palavra.lower()] for palavra in encontrados)[1]
+
 
 class ISSResultParser:
-    def __init__(self, page: Page, task_id: str):
+    def __init__(self, page: Page, task_id: str, locs: Optional[SimpleNamespace] = None):
         self.page = page
         self.task_id = task_id
+        self.locs = locs or build_locators(page)
 
-    def parse(self) -> dict:
+    async def parse(self) -> dict:
         """
         Analisa a tela final para extrair o status do processamento.
         Prioriza a leitura da Grid de Resultados.
         """
-        logger.info(f"[{self.task_id}] 🧐 Iniciando leitura dos resultados...")
+        logger.info("[%s] 🧐 Iniciando leitura dos resultados...", self.task_id)
 
         try:
-            sels = SELECTORS["importacao"]
             result_data = {
                 "success": False,
                 "message": "",
@@ -36,14 +94,19 @@ class ISSResultParser:
                 "state": "unknown",
             }
 
-            # 1. Tenta ler da Grid de Resultados (Prioritário)
-            grid_row = self.page.locator(sels.get("grid_status_row", "#dgImportacao tr:nth-child(2)"))
+            # Sem esperas aqui: o ISSUploader só retorna depois da resposta do PostBack de
+            # importação e do fim do overlay, então a tela já está pronta para leitura.
+            # Grid, mensagem e detalhe do erro vêm juntos (um evaluate, não três probes).
+            grid_raw, msg_raw, erro_raw = await self.page.evaluate(
+                _TEXTOS_VISIVEIS_JS, _SELS_RESULTADO
+            )
 
-            # Aguarda um pouco para garantir que a grid carregou após o refresh
+            # 1. Tenta ler da Grid de Resultados (Prioritário)
             try:
-                grid_row.wait_for(state="visible", timeout=5000)
-                grid_text = grid_row.inner_text().strip()
-                logger.info(f"[{self.task_id}] Texto capturado na Grid: {grid_text}")
+                if grid_raw is None:
+                    raise LookupError("grid de importação ausente")
+                grid_text = grid_raw.strip()
+                logger.info("[%s] Texto capturado na Grid: %s", self.task_id, grid_text)
 
                 # Mapa de Status da Grid
                 lower_text = grid_text.lower()
@@ -76,24 +139,20 @@ class ISSResultParser:
                 return result_data
 
             except Exception as e_grid:
-                logger.warning(f"[{self.task_id}] Não foi possível ler a grid ({e_grid}). Tentando método legado...")
+                logger.warning("[%s] Não foi possível ler a grid (%s). Tentando método legado...", self.task_id, e_grid)
 
             # 2. Fallback: Método Legado (Mensagem no topo da tela)
-            # Aguarda a presença do container de mensagem
-            msg_element = self.page.locator(sels["msg_resultado"])
-            if msg_element.is_visible():
-                full_text = msg_element.inner_text().strip()
-                logger.debug(f"[{self.task_id}] Texto bruto capturado (Legado): {full_text}")
+            if msg_raw is not None:
+                full_text = msg_raw.strip()
+                logger.debug("[%s] Texto bruto capturado (Legado): %s", self.task_id, full_text)
 
                 is_success = "sucesso" in full_text.lower() or "êxito" in full_text.lower()
                 result_data["success"] = is_success
                 result_data["message"] = full_text
                 result_data["state"] = "success" if is_success else "error"
 
-                if not is_success:
-                    error_label = self.page.locator(sels.get("msg_erro_detalhe", "#lblErro"))
-                    if error_label.is_visible():
-                        result_data["details"] = error_label.inner_text().strip()
+                if not is_success and erro_raw is not None:
+                    result_data["details"] = erro_raw.strip()
 
                 return result_data
 
@@ -106,7 +165,7 @@ class ISSResultParser:
             }
 
         except Exception as e:
-            logger.error(f"[{self.task_id}] Erro ao interpretar resultado visual: {e}")
+            logger.error("[%s] Erro ao interpretar resultado visual: %s", self.task_id, e)
 
             return {
                 "success": False,
@@ -115,56 +174,33 @@ class ISSResultParser:
                 "state": "unknown",
             }
 
-    def ler_status_processamento(self, nome_arquivo: str) -> str:
+    async def try_parse_immediate(self) -> Optional[dict]:
+        """
+        Lê a resposta exibida logo após o upload e devolve o resultado apenas se ele
+        já for terminal (sucesso ou erro).
+
+        Returns:
+            Optional[dict]: Resultado final, ou None se o portal ainda indica
+            processamento ("Aguardando") ou não foi possível classificar a tela.
         """
-        Varre a grid de solicitações na página de Consulta para encontrar a linha do arquivo enviado
-        e retornar seu status atual.
+        resultado = await self.parse()
+        if resultado.get("state") in ("pending", "unknown"):
+            return None
+        return resultado
 
-        Args:
-            nome_arquivo (str): Nome do arquivo TXT que foi enviado.
+    async def ler_texto_linha(self, nome_arquivo: str) -> str:
+        """
+        Retorna o texto bruto da linha do arquivo na grid de Consulta, em uma única
+        chamada ao navegador. Usado como fingerprint barato durante o polling.
 
         Returns:
-            str: O status encontrado (ex: "Processado com Sucesso", "Processado com Erro", "Aguardando", "NOT_FOUND").
+            str: Texto da linha, ou string vazia se a linha não for encontrada.
         """
         try:
-            sels = SELECTORS["consulta"]
-            grid_selector = sels["grid_resultados"]
-
-            # Verifica se a tabela existe
-            if not self.page.locator(grid_selector).is_visible():
-                logger.warning(f"[{self.task_id}] Tabela de resultados não encontrada.")
-                return "NOT_FOUND"
-
-            # Itera sobre as linhas da tabela (exceto cabeçalho)
-            # Estrutura esperada: Data | Competência | Nome Arquivo | Status
-            rows = self.page.locator(f"{grid_selector} tr")
-            count = rows.count()
-
-            logger.debug(f"[{self.task_id}] Analisando {count} linhas na grid de consulta...")
-
-            for i in range(count):
-                row = rows.nth(i)
-                text = row.inner_text()
-
-                # Verifica se o nome do arquivo está nesta linha
-                if nome_arquivo in text:
-                    # Assume que o status é a última coluna ou está presente no texto
-                    # Retorna o texto bruto da linha para análise posterior ou extrai o status conhecido
-                    logger.info(f"[{self.task_id}] Arquivo encontrado na linha {i}: {text}")
-
-                    text_lower = text.lower()
-                    if "sucesso" in text_lower or "êxito" in text_lower:
-                        return "Processado com Sucesso"
-                    elif "erro" in text_lower:
-                        return "Processado com Erro"
-                    elif "aguardando" in text_lower or "processando" in text_lower:
-                        return "Aguardando"
-                    else:
-                        return f"Status Desconhecido: {text}"
-
-            logger.warning(f"[{self.task_id}] Arquivo '{nome_arquivo}' não encontrado na grid.")
-            return "NOT_FOUND"
-
+            row_text = await self.page.evaluate(
+                _LINHA_ARQUIVO_JS, [_GRID_CONSULTA, nome_arquivo]
+            )
+            return row_text or ""
         except Exception as e:
-            logger.error(f"[{self.task_id}] Erro ao ler status na consulta: {e}")
-            return "ERROR"
+            logger.debug("[%s] Falha ao capturar fingerprint da grid: %s", self.task_id, e)
+            return ""
@@ -10,32 +10,115 @@ Responsabilidade:
 Arquitetura:
 - Logging estruturado com níveis distintos para Console (INFO+) e Arquivo (DEBUG+).
 - Rotação automática de logs por tamanho (evita arquivos gigantes).
+- Escrita em disco/console fora das threads de trabalho (QueueHandler + QueueListener).
 - Funções helper thread-safe para uso em ambiente multi-threading (Flask).
 """
 
-import uuid
+import os
+import gzip
+import shutil
+import stat
+import secrets
+import atexit
+import queue
 import logging
-from pathlib import Path
+import threading
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
 # --- Configuração de Diretórios ---
 
-# Define a raiz do projeto subindo dois níveis a partir deste arquivo
-# Estrutura: projeto-nfe/rpa/utils.py -> PROJECT_ROOT = projeto-nfe/
-PROJECT_ROOT = Path(__file__).resolve().parent.parent
+# Caminhos resolvidos uma única vez em rpa._paths (compartilhados com config_rpa)
+from rpa._paths import EXECUTION_LOGS_DIR, _ensure_dirs
 
-# Diretório centralizado de logs do RPA
-LOGS_DIR = PROJECT_ROOT / "rpa_logs"
-EXECUTION_LOGS_DIR = LOGS_DIR / "execution_logs"
-
-# Garante que os diretórios de log existam antes de qualquer operação
-# exist_ok=True evita exceção se o diretório já existir (idempotência)
-EXECUTION_LOGS_DIR.mkdir(parents=True, exist_ok=True)
+# Arquivo de log do dia, resolvido uma vez no import (um arquivo por dia de início do processo)
+_LOG_FILE = EXECUTION_LOGS_DIR / f"execution_{datetime.now().strftime('%Y%m%d')}.log"
 
 
 # --- Funções de Logging ---
 
+# Todos os loggers compartilham uma fila: quem loga (threads do Flask, loop do
+# Playwright) só enfileira o registro, e uma única thread (QueueListener) formata e
+# grava no arquivo e no console. Também evita vários RotatingFileHandler rotacionando
+# o mesmo arquivo diário.
+_LOG_QUEUE: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+
+# Loggers já configurados, por nome. O conjunto de nomes é pequeno e fixo (um por
+# módulo), então um dict simples basta; o lock evita que duas threads do Flask
+# configurem o mesmo logger ao mesmo tempo e dupliquem o QueueHandler.
+_LOGGER_CACHE: "dict[str, logging.Logger]" = {}
+_LOGGER_LOCK = threading.Lock()
+
+
+def _gzip_namer(name):
+    """Backups rotacionados ganham a extensão .gz (execution_YYYYMMDD.log.1.gz)."""
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    """Comprime o arquivo que atingiu maxBytes no backup e remove o original."""
+    with open(source, "rb") as src, gzip.open(dest, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _start_listener():
+    """Cria os handlers reais e inicia o QueueListener (uma vez por processo)."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        # --- Formato Enriquecido do Log ---
+        # Inclui: Data/Hora | Nível | Nome do Módulo | Linha | Thread | Mensagem
+        # O campo %(threadName)s é crítico para debug de operações assíncronas (Flask threads);
+        # ele é capturado na thread de origem, mesmo com a escrita feita pelo listener.
+        formatter = logging.Formatter(
+            fmt="%(asctime)s [%(levelname)-8s] [%(name)s:%(lineno)d] [%(threadName)s] %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+        )
+
+        # --- Handler 1: Arquivo Rotativo (Histórico Completo) ---
+        # Nome do arquivo inclui a data para facilitar auditoria diária (_LOG_FILE).
+        # RotatingFileHandler: Rotaciona quando o arquivo atinge maxBytes.
+        # maxBytes=5*1024*1024 = 5 MB por arquivo.
+        # backupCount=10 = Mantém os últimos 10 arquivos antes de sobrescrever.
+        # delay=True: o arquivo só é aberto na primeira mensagem gravada; o
+        # diretório é criado aqui, na primeira configuração, e não no import.
+        _ensure_dirs((EXECUTION_LOGS_DIR,))
+        file_handler = RotatingFileHandler(
+            _LOG_FILE,
+            maxBytes=5 * 1024 * 1024,  # 5 MB
+            backupCount=10,
+            encoding="utf-8",
+            delay=True,
+        )
+        # Backups comprimidos com gzip (texto de log encolhe ~10x); a rotação roda
+        # na thread do listener, sem atrasar quem loga.
+        file_handler.namer = _gzip_namer
+        file_handler.rotator = _gzip_rotator
+        file_handler.setFormatter(formatter)
+        file_handler.setLevel(logging.DEBUG)  # Arquivo registra TUDO (incluindo DEBUG)
+
+        # --- Handler 2: Console (Feedback Visual Limpo) ---
+        # Exibe apenas INFO+ no terminal para não poluir a saída com mensagens de debug.
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        console_handler.setLevel(
+            logging.INFO
+        )  # Console mostra INFO, WARNING, ERROR, CRITICAL
+
+        # respect_handler_level: cada handler mantém seu próprio nível (DEBUG/INFO)
+        _listener = QueueListener(
+            _LOG_QUEUE, file_handler, console_handler, respect_handler_level=True
+        )
+        _listener.start()
+        # Esvazia a fila antes de o processo terminar
+        atexit.register(_listener.stop)
+
 
 def setup_logger(name="rpa_logger", log_level=logging.DEBUG):
     """
@@ -44,10 +127,12 @@ def setup_logger(name="rpa_logger", log_level=logging.DEBUG):
     Estratégia de Logging:
     - Console (StreamHandler): Exibe apenas INFO, WARNING e ERROR (feedback visual limpo).
     - Arquivo (RotatingFileHandler): Registra TUDO (DEBUG+) com rotação automática.
+    - O logger recebe apenas um QueueHandler; os dois handlers acima são únicos no
+      processo e rodam na thread do QueueListener (sem I/O na thread que loga).
 
     Rotação de Arquivos:
     - Tamanho máximo: 5 MB por arquivo.
-    - Backup: Mantém os últimos 10 arquivos (total ~50 MB de histórico).
+    - Backup: Mantém os últimos 10 arquivos, comprimidos (.gz).
     - Nomenclatura: execution_YYYYMMDD.log (um arquivo por dia).
 
     Args:
@@ -62,54 +147,33 @@ def setup_logger(name="rpa_logger", log_level=logging.DEBUG):
         >>> logger.info("Login iniciado")
         >>> logger.debug("Resolvendo teclado virtual...")
     """
-    logger = logging.getLogger(name)
-
-    # Evita duplicação de handlers se o logger já estiver configurado.
-    # Isso previne que a mesma mensagem apareça repetida no terminal/arquivo.
-    # Importante em ambientes onde setup_logger() pode ser chamado múltiplas vezes.
-    if logger.handlers:
-        return logger
+    # Caminho rápido: logger já configurado, sem lock
+    cached = _LOGGER_CACHE.get(name)
+    if cached is not None:
+        return cached
 
-    logger.setLevel(log_level)
+    with _LOGGER_LOCK:
+        # Confere de novo: outra thread pode ter configurado enquanto esperávamos
+        cached = _LOGGER_CACHE.get(name)
+        if cached is not None:
+            return cached
 
-    # Desabilita propagação para o logger root (evita logs duplicados no Flask)
-    logger.propagate = False
+        logger = logging.getLogger(name)
 
-    # --- Formato Enriquecido do Log ---
-    # Inclui: Data/Hora | Nível | Nome do Módulo | Linha | Thread | Mensagem
-    # O campo %(threadName)s é crítico para debug de operações assíncronas (Flask threads).
-    formatter = logging.Formatter(
-        fmt="%(asctime)s [%(levelname)-8s] [%(name)s:%(lineno)d] [%(threadName)s] %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-    )
+        # Evita duplicação de handlers se o logger já tiver sido configurado por fora.
+        # Isso previne que a mesma mensagem apareça repetida no terminal/arquivo.
+        if not logger.handlers:
+            logger.setLevel(log_level)
 
-    # --- Handler 1: Arquivo Rotativo (Histórico Completo) ---
-    # Nome do arquivo inclui a data para facilitar auditoria diária.
-    log_filename = f"execution_{datetime.now().strftime('%Y%m%d')}.log"
-    log_filepath = EXECUTION_LOGS_DIR / log_filename
+            # Desabilita propagação para o logger root (evita logs duplicados no Flask)
+            logger.propagate = False
 
-    # RotatingFileHandler: Rotaciona quando o arquivo atinge maxBytes.
-    # maxBytes=5*1024*1024 = 5 MB por arquivo.
-    # backupCount=10 = Mantém os últimos 10 arquivos antes de sobrescrever.
-    file_handler = RotatingFileHandler(
-        log_filepath, maxBytes=5 * 1024 * 1024, backupCount=10, encoding="utf-8"  # 5 MB
-    )
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.DEBUG)  # Arquivo registra TUDO (incluindo DEBUG)
+            # Handlers reais ficam no listener compartilhado; o logger só enfileira
+            _start_listener()
+            logger.addHandler(QueueHandler(_LOG_QUEUE))
 
-    # --- Handler 2: Console (Feedback Visual Limpo) ---
-    # Exibe apenas INFO+ no terminal para não poluir a saída com mensagens de debug.
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(
-        logging.INFO
-    )  # Console mostra INFO, WARNING, ERROR, CRITICAL
-
-    # Anexa os handlers ao logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-
-    return logger
+        _LOGGER_CACHE[name] = logger
+        return logger
 
 
 def get_module_logger(module_name):
@@ -135,7 +199,7 @@ def get_module_logger(module_name):
         # 2025-11-19 14:32:10 [INFO    ] [rpa.authentication:45] [Thread-1] Resolvendo teclado virtual...
     """
     # Cria hierarquia de loggers: 'rpa.authentication', 'rpa.uploader', etc.
-    # Isso permite filtragem por namespace se necessário.
+    # Isso permite filtragem por namespace se necessário. (Usa o mesmo cache de setup_logger.)
     full_name = f"rpa.{module_name}"
     return setup_logger(full_name)
 
@@ -148,8 +212,9 @@ def generate_task_id():
     Gera um identificador único para uma tarefa de RPA.
 
     Estratégia:
-    - Usa UUID4 (aleatório, seguro para ambientes distribuídos).
-    - Trunca para 8 caracteres hexadecimais (suficiente para unicidade em contexto local).
+    - Usa 4 bytes aleatórios do SO (secrets.token_hex), sem montar um UUID inteiro
+      só para descartar a maior parte dele.
+    - Gera 8 caracteres hexadecimais (suficiente para unicidade em contexto local).
     - Prefixo 'rpa_' facilita identificação visual nos logs.
 
     Returns:
@@ -165,7 +230,7 @@ def generate_task_id():
         - Rastrear execuções no banco de dados ou fila de tarefas.
         - Correlacionar logs de múltiplas funções na mesma execução.
     """
-    return f"rpa_{uuid.uuid4().hex[:8]}"
+    return f"rpa_{secrets.token_hex(4)}"
 
 
 def validate_file_exists(file_path):
@@ -195,28 +260,45 @@ def validate_file_exists(file_path):
     - Chamado pelo bot_controller.py antes de iniciar o navegador.
     - Evita abrir sessão Playwright para descobrir que o arquivo não existe.
     - Melhora feedback ao usuário (erro rápido vs timeout de 30s).
+
+    Desempenho:
+    - Um único os.stat por chamada (antes: exists + is_file + stat).
+    """
+    is_valid, error, _ = validate_file_with_size(file_path)
+    return is_valid, error
+
+
+def validate_file_with_size(file_path):
+    """
+    Mesmas validações de `validate_file_exists`, devolvendo também o tamanho do
+    arquivo lido no mesmo os.stat (quem envia o arquivo não precisa de outro stat).
+
+    Returns:
+        tuple[bool, str, int]: (is_valid, error_message, tamanho_em_bytes);
+            o tamanho é 0 se o caminho não existir.
     """
-    # Converte para Path object (suporta tanto string quanto Path)
-    path = Path(file_path)
+    # str ou Path viram o mesmo caminho (str devolvida sem cópia);
+    # nenhum Path é construído no caminho feliz.
+    path = os.fspath(file_path)
 
     # Validação 1: O caminho existe no filesystem?
-    if not path.exists():
-        return False, f"Arquivo não encontrado: {file_path}"
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False, f"Arquivo não encontrado: {file_path}", 0
 
     # Validação 2: É um arquivo regular (não um diretório ou link simbólico)?
-    if not path.is_file():
-        return False, f"Caminho não aponta para um arquivo válido: {file_path}"
+    if not stat.S_ISREG(st.st_mode):
+        return False, f"Caminho não aponta para um arquivo válido: {path}", st.st_size
 
     # Validação 3: O arquivo tem conteúdo (não está vazio)?
-    # stat().st_size retorna o tamanho em bytes.
-    file_size = path.stat().st_size
-    if file_size == 0:
-        return False, f"Arquivo vazio (0 bytes): {file_path}"
+    if st.st_size == 0:
+        return False, f"Arquivo vazio (0 bytes): {path}", 0
 
     # Opcional: Log de sucesso para auditoria (comentado para não poluir)
-    # logger.debug(f"Arquivo válido: {file_path} ({file_size} bytes)")
+    # logger.debug(f"Arquivo válido: {path} ({st.st_size} bytes)")
 
-    return True, ""
+    return True, "", st.st_size
 
 
 # --- Exemplo de Uso (Executado apenas se o script for chamado diretamente) ---
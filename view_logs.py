@@ -1,39 +1,117 @@
+import collections
+import gzip
 import os
-import glob
+import shutil
+import sys
 from pathlib import Path
 
 # Path to logs based on project structure
 PROJECT_ROOT = Path(__file__).resolve().parent
 LOGS_DIR = PROJECT_ROOT / "rpa_logs" / "execution_logs"
 
+# By default only the tail of the log is shown (a rotated file can reach 5 MB)
+TAIL_BYTES = 256 * 1024
 
-def view_latest_log():
+
+def _is_log_name(name):
+    # Current file (execution_YYYYMMDD.log) or a gzipped backup (execution_YYYYMMDD.log.N.gz)
+    return name.endswith(".log") or (name.endswith(".gz") and ".log." in name)
+
+
+def _gzip_tail(f):
+    """
+    Last TAIL_BYTES of a gzip stream, in a single decompression pass: a GzipFile
+    can only find its end (or seek back) by decompressing everything again.
+
+    Returns (data, truncated); when truncated, the partial first line is dropped.
+    """
+    chunks = collections.deque()
+    kept = 0
+    total = 0
+    for chunk in iter(lambda: f.read(64 * 1024), b""):
+        chunks.append(chunk)
+        kept += len(chunk)
+        total += len(chunk)
+        # Keep only as many chunks as needed to cover the tail
+        while kept - len(chunks[0]) >= TAIL_BYTES:
+            kept -= len(chunks.popleft())
+
+    data = b"".join(chunks)[-TAIL_BYTES:]
+    truncated = total > TAIL_BYTES
+    if truncated:
+        data = data[data.find(b"\n") + 1 :]  # Drop the partial first line
+    return data, truncated
+
+
+def _print_tail_banner():
+    print(f"[Showing last {TAIL_BYTES // 1024} KB; use --full for the whole file]\n")
+
+
+def _stream(f):
+    # Stream raw bytes in 64 KiB chunks; memory stays flat even with --full
+    sys.stdout.flush()
+    shutil.copyfileobj(f, sys.stdout.buffer, length=64 * 1024)
+    sys.stdout.buffer.flush()
+
+
+def view_latest_log(full=False):
     if not LOGS_DIR.exists():
         print(f"Log directory not found: {LOGS_DIR}")
         return
 
-    # Find all .log files
-    log_files = glob.glob(str(LOGS_DIR / "execution_*.log"))
+    # Single directory pass; DirEntry.stat() reuses the entry instead of a path lookup
+    with os.scandir(LOGS_DIR) as entries:
+        latest = max(
+            (
+                e
+                for e in entries
+                if e.name.startswith("execution_") and _is_log_name(e.name) and e.is_file()
+            ),
+            key=lambda e: e.stat().st_mtime,
+            default=None,
+        )
 
-    if not log_files:
+    if latest is None:
         print("No log files found.")
         return
 
-    # Sort by modification time (newest first)
-    latest_log = max(log_files, key=os.path.getmtime)
+    latest_log = latest.path
 
-    print(f"\n--- Reading Latest Log: {os.path.basename(latest_log)} ---\n")
+    print(f"\n--- Reading Latest Log: {latest.name} ---\n")
 
     try:
-        with open(latest_log, "r", encoding="utf-8") as f:
-            content = f.read()
-            if content:
-                print(content)
-            else:
+        if latest_log.endswith(".gz"):
+            # Rotated backup: decompressed once, either streamed (--full) or tailed
+            with gzip.open(latest_log, "rb") as f:
+                if full:
+                    _stream(f)
+                    return
+                data, truncated = _gzip_tail(f)
+            if not data and not truncated:
                 print("[File is empty]")
+                return
+            if truncated:
+                _print_tail_banner()
+            sys.stdout.flush()
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(latest_log, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                print("[File is empty]")
+                return
+            if full or size <= TAIL_BYTES:
+                f.seek(0)
+            else:
+                f.seek(size - TAIL_BYTES)
+                f.readline()  # Drop the partial first line
+                _print_tail_banner()
+            _stream(f)
     except Exception as e:
         print(f"Error reading log file: {e}")
 
 
 if __name__ == "__main__":
-    view_latest_log()
+    view_latest_log(full="--full" in sys.argv[1:])